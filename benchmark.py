@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+ApproveIT benchmark - measures the hot paths of image_approver.py headless.
+
+Generates synthetic image folders, drives the engine and the GUI with the Tk
+display mocked out, and prints the results as JSON so runs can be compared
+over time:
+
+    python3 benchmark.py --count 200 --size 4000x3000 --formats jpeg,png
+    python3 benchmark.py --output results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from unittest import mock
+
+import PIL
+from PIL import Image
+
+import image_approver
+
+FORMATS = {
+    'jpeg': ('JPEG', '.jpg', {'quality': 90}),
+    'png': ('PNG', '.png', {}),
+    'tiff': ('TIFF', '.tif', {}),
+    'webp': ('WEBP', '.webp', {'quality': 90}),
+}
+
+
+def percentiles(samples):
+    """Summary of latency samples in milliseconds"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+
+    def pick(fraction):
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000, 3)
+
+    return {
+        'count': len(ordered),
+        'mean': round(statistics.fmean(ordered) * 1000, 3),
+        'p50': pick(0.50),
+        'p90': pick(0.90),
+        'p95': pick(0.95),
+        'p99': pick(0.99),
+        'max': round(ordered[-1] * 1000, 3),
+    }
+
+
+def synthetic_image(size, seed):
+    """A photo-like test image: smooth gradients with sensor-style noise"""
+    width, height = size
+    gradient = Image.linear_gradient('L').resize(size)
+    noise = Image.effect_noise(size, 20 + seed % 40)
+    red = Image.blend(gradient, noise, 0.3)
+    green = Image.blend(gradient.rotate(90 + seed * 7), noise, 0.5).resize(size)
+    blue = Image.radial_gradient('L').resize(size)
+    return Image.merge('RGB', (red, green, blue))
+
+
+def make_folder(folder, count, size, formats, variants=8):
+    """Fill folder with count images spread over formats; returns the file names.
+
+    Only a few distinct images per format are encoded, the rest are byte
+    copies - decoding cost is the same and setup stays fast.
+    """
+    os.makedirs(folder, exist_ok=True)
+    names = []
+    for index in range(count):
+        fmt = formats[index % len(formats)]
+        pil_format, extension, options = FORMATS[fmt]
+        name = f"bench_{index:06d}{extension}"
+        variant = os.path.join(folder, f"bench_{index % (variants * len(formats)):06d}{extension}")
+        if index < variants * len(formats):
+            synthetic_image(size, index).save(variant, pil_format, **options)
+        else:
+            shutil.copyfile(variant, os.path.join(folder, name))
+        names.append(name)
+    return names
+
+
+class FakeRoot:
+    """Stand-in for the Tk root: after() callbacks are queued and run by pump()"""
+
+    def __init__(self):
+        self.callbacks = []
+        self.widget = mock.MagicMock()
+
+    def after(self, delay, callback=None, *args):
+        if callback:
+            self.callbacks.append((callback, args))
+        return f"after#{len(self.callbacks)}"
+
+    def after_idle(self, callback, *args):
+        return self.after(0, callback, *args)
+
+    def after_cancel(self, job):
+        pass
+
+    def __getattr__(self, name):
+        # Everything else (bind, title, geometry, ...) is a no-op
+        return getattr(self.widget, name)
+
+    def pump(self, until=None, timeout=30.0):
+        """Run queued callbacks until until() is true (or once through without it)"""
+        deadline = time.perf_counter() + timeout
+        while True:
+            callbacks, self.callbacks = self.callbacks, []
+            for callback, args in callbacks:
+                callback(*args)
+            if until is None or until() or time.perf_counter() > deadline:
+                return
+            time.sleep(0.001)
+
+
+def mocked_tk():
+    """Patch the Tk modules out of image_approver; returns the patchers to stop"""
+    patchers = [mock.patch.object(image_approver, name, mock.MagicMock(), create=True)
+                for name in ('tk', 'ttk', 'ImageTk', 'messagebox', 'filedialog')]
+    for patcher in patchers:
+        patcher.start()
+    # A distinct object per bitmap, so the photo pool behaves as it does with Tk
+    image_approver.ImageTk.PhotoImage.side_effect = lambda *args, **kwargs: mock.MagicMock()
+    return patchers
+
+
+def make_app(canvas_size=(1280, 800)):
+    root = FakeRoot()
+    app = image_approver.ImageApprover(root)
+    app.canvas.winfo_width.return_value = canvas_size[0]
+    app.canvas.winfo_height.return_value = canvas_size[1]
+    return app, root
+
+
+def bench_scan(folder, repeat):
+    engine = image_approver.ApprovalEngine()
+    samples = []
+    found = 0
+    try:
+        for _ in range(repeat):
+            engine.open_folder(folder, create_folders=False)
+            start = time.perf_counter()
+            found = len(engine.scan())
+            samples.append(time.perf_counter() - start)
+    finally:
+        engine.close()
+    return {'files': found, 'seconds': percentiles(samples)}
+
+
+def bench_decode(folder, names, zoom, limit):
+    """Cold decode + resize through the loader, without the preview cache"""
+    loader = image_approver.ImageLoader()
+    by_format = {}
+    for name in names[:limit]:
+        path = os.path.join(folder, name)
+        start = time.perf_counter()
+        loader(path, zoom)
+        by_format.setdefault(os.path.splitext(name)[1], []).append(time.perf_counter() - start)
+    return {extension: percentiles(samples) for extension, samples in by_format.items()}
+
+
+def bench_gui(folder, zoom_steps, navigate):
+    """Time to first image, zoom steps and image-to-image navigation in the GUI"""
+    app, root = make_app()
+    results = {}
+    try:
+        app.engine.open_folder(folder)
+        start = time.perf_counter()
+        app.load_images()
+        root.pump(until=lambda: app.shown_path is not None)
+        results['first_image_ms'] = round((time.perf_counter() - start) * 1000, 3)
+
+        # Zoom as soon as the image is up: the first step must not wait for the pyramid build
+        fast, refined = [], []
+        first_zoom = time.perf_counter()
+        for step in range(zoom_steps):
+            zoom = app.zoom_in if step < zoom_steps // 2 else app.zoom_out
+            start = time.perf_counter()
+            zoom()
+            # What the render scheduler runs on the next frame
+            app.flush_render()
+            fast.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            app.refine_zoom()
+            refined.append(time.perf_counter() - start)
+            if step == 0:
+                results['first_zoom_step_ms'] = round(fast[0] * 1000, 3)
+                # Until then zoom steps upscale what was on screen
+                root.pump(until=lambda: app.pyramid is not None and app.pyramid.covers(app.zoom_factor))
+                results['zoom_detail_ms'] = round((time.perf_counter() - first_zoom) * 1000, 3)
+        results['zoom_step'] = percentiles(fast)
+        results['zoom_refine'] = percentiles(refined)
+
+        app.reset_zoom()
+        samples = []
+        for _ in range(min(navigate, len(app.engine.image_files) - 1)):
+            # Give the prefetcher the time a reviewer would spend looking
+            root.pump(until=lambda: not app.prefetcher.pending, timeout=5.0)
+            start = time.perf_counter()
+            app.next_image()
+            app.flush_render()
+            samples.append(time.perf_counter() - start)
+        results['next_image'] = percentiles(samples)
+    finally:
+        app.prefetcher.shutdown()
+        app.engine.close()
+    return results
+
+
+def bench_moves(folder, names, deferred):
+    """Decide every image and measure until the files have actually moved"""
+    engine = image_approver.ApprovalEngine()
+    try:
+        engine.open_folder(folder)
+        engine.scan()
+        engine.defer_moves = deferred
+        decide = []
+        start = time.perf_counter()
+        while engine.image_files:
+            decide_start = time.perf_counter()
+            engine.decide(0, engine.approved_folder, "approved")
+            decide.append(time.perf_counter() - decide_start)
+        if deferred:
+            engine.commit()
+        engine.mover.wait_all()
+        elapsed = time.perf_counter() - start
+    finally:
+        engine.close()
+    return {
+        'files': len(decide),
+        'files_per_second': round(len(decide) / elapsed, 1) if elapsed else None,
+        'decide': percentiles(decide),
+    }
+
+
+def parse_size(text):
+    width, _, height = text.lower().partition('x')
+    return int(width), int(height)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=100, help="images per generated folder")
+    parser.add_argument("--size", type=parse_size, default=(3000, 2000), help="image size, WIDTHxHEIGHT")
+    parser.add_argument("--formats", default="jpeg,png,tiff,webp", help="comma-separated: " + ",".join(FORMATS))
+    parser.add_argument("--zoom", type=float, default=0.4, help="zoom factor for the decode benchmark")
+    parser.add_argument("--repeat", type=int, default=5, help="scan repetitions")
+    parser.add_argument("--decode-limit", type=int, default=50, help="images to decode per run")
+    parser.add_argument("--zoom-steps", type=int, default=10)
+    parser.add_argument("--navigate", type=int, default=20, help="next-image steps to time")
+    parser.add_argument("--keep", action="store_true", help="keep the generated folders")
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    parser.add_argument("--trace", help="also write the recorded spans as a Chrome trace")
+    args = parser.parse_args(argv)
+
+    formats = [fmt.strip().lower() for fmt in args.formats.split(',') if fmt.strip()]
+    unknown = [fmt for fmt in formats if fmt not in FORMATS]
+    if unknown:
+        parser.error(f"unknown format(s): {', '.join(unknown)}")
+
+    workdir = tempfile.mkdtemp(prefix="approveit-bench-")
+    # Keep the journal and preview cache out of the user's cache directory
+    os.environ['XDG_CACHE_HOME'] = os.environ['LOCALAPPDATA'] = os.path.join(workdir, "cache")
+    os.environ['APPROVEIT_PREVIEW_CACHE_MB'] = '0'
+    patchers = mocked_tk()
+    try:
+        started = time.perf_counter()
+        source = os.path.join(workdir, "source")
+        names = make_folder(source, args.count, args.size, formats)
+        setup_seconds = time.perf_counter() - started
+
+        results = {
+            'machine': {
+                'python': platform.python_version(),
+                'pillow': PIL.__version__,
+                'platform': platform.platform(),
+                'cpus': os.cpu_count(),
+            },
+            'parameters': {
+                'count': args.count,
+                'size': list(args.size),
+                'formats': formats,
+                'zoom': args.zoom,
+            },
+            'setup_seconds': round(setup_seconds, 3),
+            'scan': bench_scan(source, args.repeat),
+            'decode_resize': bench_decode(source, names, args.zoom, args.decode_limit),
+        }
+
+        gui_folder = os.path.join(workdir, "gui")
+        shutil.copytree(source, gui_folder)
+        results['gui'] = bench_gui(gui_folder, args.zoom_steps, args.navigate)
+
+        for label, deferred in (('moves', False), ('moves_committed', True)):
+            move_folder = os.path.join(workdir, label)
+            shutil.copytree(source, move_folder)
+            results[label] = bench_moves(move_folder, names, deferred)
+        results['hit_rates'] = {cache: round(rate, 3) for cache, rate in image_approver.PERF.hit_rates().items()}
+        if args.trace:
+            image_approver.PERF.export_chrome_trace(args.trace)
+    finally:
+        for patcher in patchers:
+            patcher.stop()
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,14 +9,2894 @@ This tool helps users quickly review large collections of images and sort them
 into "approved" and "disapproved" categories using an intuitive UI with keyboard shortcuts.
 """
 
-import tkinter as tk
-from tkinter import ttk, filedialog, messagebox
-from PIL import Image, ImageTk
+from PIL import Image
+import argparse
+import ctypes
+import ctypes.util
+import csv
+import errno
+import functools
+import getpass
+import io
+import itertools
+import json
+import mmap
+import multiprocessing
 import os
+import queue
+import select
 import shutil
-from collections import deque
+import sqlite3
+import struct
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+try:
+    import tkinter as tk
+    from tkinter import ttk, filedialog, messagebox, simpledialog
+    from PIL import ImageTk
+except ImportError:
+    # Headless servers often lack Tk - the command-line engine still works there
+    tk = None
+
+try:
+    import numpy as np
+except ImportError:
+    # Perceptual hashing (burst detection) is skipped without NumPy
+    np = None
+
+
+# Extensions accepted without touching the file; anything else is sniffed
+IMAGE_EXTENSIONS = frozenset((
+    '.jpg', '.jpeg', '.jpe', '.jfif', '.png', '.gif', '.bmp', '.dib', '.tif', '.tiff',
+    '.webp', '.ico', '.ppm', '.pgm', '.pbm', '.pnm', '.tga', '.jp2', '.j2k', '.psd',
+))
+
+# Leading bytes of the formats Pillow can open that commonly come without an extension
+IMAGE_SIGNATURES = (
+    b'\xff\xd8\xff', b'\x89PNG\r\n\x1a\n', b'GIF87a', b'GIF89a', b'BM',
+    b'II*\x00', b'MM\x00*', b'\x00\x00\x00\x0cjP  ', b'8BPS',
+)
+
+
+def sniff_image_header(file_path):
+    """Check the first bytes of a file against known image signatures"""
+    try:
+        with open(file_path, 'rb') as f:
+            head = f.read(16)
+    except OSError:
+        return False
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return True
+    return head.startswith(IMAGE_SIGNATURES)
+
+
+def is_image_candidate(entry):
+    """Cheap check for a directory entry - full validation happens on display"""
+    return is_image_path(entry.path)
+
+
+def is_image_path(file_path):
+    if file_path.endswith(PARTIAL_SUFFIX):
+        # Half-copied file of a move in progress
+        return False
+    if os.path.splitext(file_path)[1].lower() in IMAGE_EXTENSIONS:
+        return True
+    return sniff_image_header(file_path)
+
+
+class FolderScanner:
+    """Stream the image files of a folder from a background thread.
+
+    Names are handed over in batches through a queue so the UI can show the
+    first image as soon as it is found and keep filling the list afterwards.
+    """
+
+    def __init__(self, folder, batch_size=256, flush_interval=0.1):
+        self.folder = folder
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.results = queue.Queue()
+        self.stop_event = threading.Event()
+        self.finished = False
+        self.thread = threading.Thread(target=self._run, name="folder-scan", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _run(self):
+        batch = []
+        found_any = False
+        last_flush = time.monotonic()
+        try:
+            with os.scandir(self.folder) as entries:
+                for entry in entries:
+                    if self.stop_event.is_set():
+                        return
+                    try:
+                        if not entry.is_file() or not is_image_candidate(entry):
+                            continue
+                    except OSError:
+                        continue
+                    batch.append(entry.name)
+                    now = time.monotonic()
+                    # Hand the very first hit over immediately, then batch up
+                    if not found_any or len(batch) >= self.batch_size or now - last_flush >= self.flush_interval:
+                        self.results.put(batch)
+                        batch = []
+                        found_any = True
+                        last_flush = now
+        except OSError:
+            pass
+        finally:
+            if batch:
+                self.results.put(batch)
+            self.results.put(None)
+
+    def drain(self):
+        """Return the names found since the last call without blocking"""
+        names = []
+        while True:
+            try:
+                batch = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if batch is None:
+                self.finished = True
+            else:
+                names.extend(batch)
+        return names
+
+
+class FolderWatcher:
+    """Report files that appear in or disappear from a folder after a scan.
+
+    Uses inotify where the C library provides it and falls back to polling
+    the folder otherwise. Events are ('added', name) and ('removed', name)
+    tuples handed over through drain(); callers check them against the disk
+    since their own moves show up here too.
+    """
+
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_FROM = 0x040
+    IN_MOVED_TO = 0x080
+    IN_DELETE = 0x200
+    IN_Q_OVERFLOW = 0x4000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self, folder, poll_interval=2.0):
+        self.folder = folder
+        self.poll_interval = poll_interval
+        self.events = queue.Queue()
+        self.stop_event = threading.Event()
+        self.fd = self._open_inotify()
+        self.thread = threading.Thread(target=self._run, name="folder-watch", daemon=True)
+
+    def _open_inotify(self):
+        """Return an inotify descriptor watching the folder, or None to poll instead"""
+        if not sys.platform.startswith('linux'):
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        except (OSError, AttributeError):
+            return None
+        if fd < 0:
+            return None
+        mask = self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_MOVED_FROM | self.IN_DELETE
+        if libc.inotify_add_watch(fd, os.fsencode(self.folder), mask) < 0:
+            # Out of watches, or a file system without inotify support
+            os.close(fd)
+            return None
+        return fd
+
+    @property
+    def polling(self):
+        return self.fd is None
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _run(self):
+        try:
+            if self.fd is None:
+                self._poll()
+            else:
+                self._watch()
+        except OSError:
+            # The folder went away - nothing left to watch
+            pass
+
+    def _watch(self):
+        try:
+            while not self.stop_event.is_set():
+                # Wake up regularly to notice stop()
+                if not select.select([self.fd], [], [], 0.5)[0]:
+                    continue
+                try:
+                    data = os.read(self.fd, 64 * 1024)
+                except BlockingIOError:
+                    continue
+                offset = 0
+                while offset < len(data):
+                    _, mask, _, length = self.EVENT_HEADER.unpack_from(data, offset)
+                    offset += self.EVENT_HEADER.size
+                    name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+                    offset += length
+                    if mask & self.IN_Q_OVERFLOW:
+                        # Events were lost: report everything (drain_watch skips what it already
+                        # knows about), then fall back to comparing listings
+                        listing = self._listing()
+                        for name in listing:
+                            self.events.put(('added', name))
+                        self._poll(set(listing))
+                        return
+                    if not name:
+                        continue
+                    if mask & (self.IN_CLOSE_WRITE | self.IN_MOVED_TO):
+                        self.events.put(('added', name))
+                    elif mask & (self.IN_DELETE | self.IN_MOVED_FROM):
+                        self.events.put(('removed', name))
+        finally:
+            os.close(self.fd)
+            self.fd = None
+
+    def _listing(self):
+        listing = {}
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        listing[entry.name] = (stat.st_size, stat.st_mtime_ns)
+                except OSError:
+                    continue
+        return listing
+
+    def _poll(self, known=None):
+        if known is None:
+            known = set(self._listing())
+        previous = {}
+        while not self.stop_event.wait(self.poll_interval):
+            listing = self._listing()
+            for name in known - listing.keys():
+                self.events.put(('removed', name))
+            known &= listing.keys()
+            for name, signature in listing.items():
+                # Only report a new file once it has stopped growing
+                if name not in known and previous.get(name) == signature:
+                    known.add(name)
+                    self.events.put(('added', name))
+            previous = listing
+
+    def drain(self):
+        """Return the events seen since the last call without blocking"""
+        events = []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events
+
+
+class PerfRecorder:
+    """Ring buffer of hot-path timings plus cache hit counters.
+
+    Recording is a perf_counter() call and a list store, cheap enough to stay
+    on permanently; the oldest spans are overwritten once capacity is reached.
+    Spans come from any thread and can be exported as a Chrome trace.
+    """
+
+    def __init__(self, capacity=8192):
+        self.capacity = capacity
+        self.spans = [None] * capacity  # (name, start, duration, thread id)
+        self.counter = itertools.count()  # next() is atomic under the GIL
+        self.written = 0
+        self.hits = {}  # cache name -> [hits, misses]
+        self.epoch = time.perf_counter()
+
+    def add(self, name, start, end=None):
+        """Record a span that began at start (a perf_counter() value) and ends now or at end"""
+        if end is None:
+            end = time.perf_counter()
+        index = next(self.counter)
+        self.spans[index % self.capacity] = (name, start, end - start, threading.get_ident())
+        self.written = index + 1
+
+    def count(self, cache, hit):
+        counts = self.hits.setdefault(cache, [0, 0])
+        counts[0 if hit else 1] += 1
+
+    def recent(self):
+        """The spans still in the buffer, oldest first"""
+        if self.written <= self.capacity:
+            return [span for span in self.spans[:self.written] if span]
+        cut = self.written % self.capacity
+        return [span for span in self.spans[cut:] + self.spans[:cut] if span]
+
+    def summary(self):
+        """{name: (count, p50 ms, p95 ms)} over the spans in the buffer"""
+        durations = {}
+        for name, _, duration, _ in self.recent():
+            durations.setdefault(name, []).append(duration)
+        summary = {}
+        for name, values in durations.items():
+            values.sort()
+            summary[name] = (len(values), values[len(values) // 2] * 1000,
+                             values[min(len(values) - 1, int(len(values) * 0.95))] * 1000)
+        return summary
+
+    def hit_rates(self):
+        return {cache: hits / (hits + misses) for cache, (hits, misses) in self.hits.items() if hits + misses}
+
+    def export_chrome_trace(self, path):
+        """Write the buffered spans as Chrome trace events (chrome://tracing, Perfetto)"""
+        pid = os.getpid()
+        events = [{'name': name, 'cat': 'approveit', 'ph': 'X', 'pid': pid, 'tid': thread,
+                   'ts': round((start - self.epoch) * 1e6, 1), 'dur': round(duration * 1e6, 1)}
+                  for name, start, duration, thread in self.recent()]
+        for thread in threading.enumerate():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': thread.ident,
+                           'args': {'name': thread.name}})
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        return len(events)
+
+
+# Timings of this process's hot paths
+PERF = PerfRecorder()
+
+
+def timed(name):
+    """Record every call of the decorated function as a span named name"""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                PERF.add(name, start)
+        return wrapper
+    return decorate
+
+
+def process_pool(workers=None):
+    """Process pool that is safe to start from a threaded (Tk) process.
+
+    Its workers share LARGE_DECODE_LOCK with this process.
+    """
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                               initializer=use_decode_lock, initargs=(LARGE_DECODE_LOCK,))
+
+
+def use_decode_lock(lock):
+    """Pool worker initializer: take part in the parent's LARGE_DECODE_LOCK"""
+    global LARGE_DECODE_LOCK
+    LARGE_DECODE_LOCK = lock
+
+
+def probe_images(folder, names):
+    """Validate files and read their metadata; runs in worker processes.
+
+    Returns (name, entry) pairs where entry is [size, mtime_ns, width, height,
+    format, EXIF orientation, perceptual hashes, quality metrics], with width
+    None for files that are not images and the last two None without NumPy.
+    Files that could not be read for any other reason are left out.
+    """
+    results = []
+    thumbnails = []
+    for name in names:
+        path = os.path.join(folder, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entry = [stat.st_size, stat.st_mtime_ns, None, None, None, 1, None, None]
+        try:
+            with open_image(path) as image:
+                entry[2:6] = [image.width, image.height, image.format, image.getexif().get(0x0112, 1)]
+                if np is not None:
+                    gray = decode_reduced(image, (384, 384)).convert('L')
+                    gray.thumbnail((384, 384), Image.BOX)
+                    entry[7] = image_quality(np.asarray(gray, dtype=np.float32))
+                    thumbnails.append((entry, gray.resize((32, 32), Image.BOX), gray.resize((9, 8), Image.BOX)))
+        except (Image.UnidentifiedImageError, SyntaxError):
+            # Not a valid image file
+            pass
+        except Exception:
+            # Unreadable for now (still being copied, locked, out of memory) - no entry, so it is tried again
+            continue
+        results.append((name, entry))
+    
+    if thumbnails:
+        # Hash the whole chunk in one go
+        hashes = perceptual_hashes(np.stack([np.asarray(t[1], dtype=np.float32) for t in thumbnails]),
+                                   np.stack([np.asarray(t[2], dtype=np.float32) for t in thumbnails]))
+        for (entry, _, _), row in zip(thumbnails, hashes.tolist()):
+            entry[6] = row
+    return results
+
+
+def image_quality(pixels):
+    """[sharpness, dark fraction, bright fraction, mean luminance] of a grayscale array.
+
+    Sharpness is the variance of the Laplacian; blurry frames have few edges
+    and score low. The fractions count pixels clipped to black or white.
+    """
+    laplacian = (4 * pixels[1:-1, 1:-1] - pixels[:-2, 1:-1] - pixels[2:, 1:-1]
+                 - pixels[1:-1, :-2] - pixels[1:-1, 2:])
+    return [round(float(laplacian.var()), 1), round(float((pixels <= 4).mean()), 4),
+            round(float((pixels >= 251).mean()), 4), round(float(pixels.mean()), 1)]
+
+
+class QualityScreen:
+    """Flag obvious rejects from the quality metrics stored in the index"""
+
+    def __init__(self, min_sharpness=40.0, max_clipped=0.3, min_luminance=20.0, max_luminance=235.0):
+        self.min_sharpness = min_sharpness
+        self.max_clipped = max_clipped
+        self.min_luminance = min_luminance
+        self.max_luminance = max_luminance
+
+    def verdict(self, quality):
+        """Why an image looks like a reject ('blurry', 'underexposed', 'overexposed'), or None"""
+        if not quality:
+            return None
+        sharpness, dark, bright, luminance = quality
+        if bright > self.max_clipped or luminance > self.max_luminance:
+            return 'overexposed'
+        if dark > self.max_clipped or luminance < self.min_luminance:
+            return 'underexposed'
+        if sharpness < self.min_sharpness:
+            return 'blurry'
+        return None
+
+
+def pack_bits(bits):
+    """(n, 64) booleans -> n 64-bit integers"""
+    return np.packbits(bits.reshape(len(bits), 64), axis=1).view('>u8').ravel()
+
+
+def perceptual_hashes(pixels, gradient_pixels):
+    """aHash, dHash and pHash of a stack of images as an (n, 3) uint64 array.
+
+    pixels are (n, 32, 32) grayscale thumbnails, gradient_pixels (n, 8, 9).
+    """
+    count = len(pixels)
+    # aHash: 8x8 block means against their average
+    blocks = pixels.reshape(count, 8, 4, 8, 4).mean(axis=(2, 4))
+    average = pack_bits(blocks > blocks.mean(axis=(1, 2), keepdims=True))
+    # dHash: is each pixel brighter than its left neighbour
+    difference = pack_bits(gradient_pixels[:, :, 1:] > gradient_pixels[:, :, :-1])
+    # pHash: lowest 8x8 DCT frequencies against their median
+    k = np.arange(32)
+    dct = 2 * np.cos(np.pi * np.outer(k, 2 * k + 1) / 64).astype(np.float32)
+    low = np.einsum('kn,bnm,lm->bkl', dct[:8], pixels, dct[:8])
+    perceptual = pack_bits(low > np.median(low.reshape(count, 64), axis=1)[:, None, None])
+    return np.stack([average, difference, perceptual], axis=1)
+
+
+def popcount(values):
+    """Number of set bits in each element of an unsigned integer array"""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values)
+    bits = np.unpackbits(values.view(np.uint8)).reshape(values.shape + (-1,))
+    return bits.sum(axis=-1, dtype=np.uint8)
+
+
+def find_bursts(hashes, radius=10):
+    """Group near-duplicate images: those whose aHash, dHash and pHash all lie
+    within radius bits of another image's.
+
+    hashes maps names to their (aHash, dHash, pHash); returns a dict mapping
+    every name that has a near-duplicate to the list of names in its group,
+    the same list object for all members.
+
+    A multi-index hash table keeps this near linear: the pHash is cut into
+    radius + 1 chunks, and two hashes within radius bits of each other must
+    agree exactly on at least one of them. Only images sharing a chunk are
+    compared, a whole batch at a time.
+    """
+    names = list(hashes)
+    if len(names) < 2 or np is None:
+        return {}
+    table = np.array([hashes[name] for name in names], dtype=np.uint64)
+    key = table[:, 2]
+    parent = list(range(len(names)))
+    
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+    
+    chunks = radius + 1
+    width, wider = divmod(64, chunks)
+    shift = 0
+    for chunk in range(chunks):
+        bits = width + (chunk < wider)
+        values = (key >> np.uint64(shift)) & np.uint64((1 << bits) - 1)
+        shift += bits
+        order = np.argsort(values, kind='stable')
+        values = values[order]
+        # How many of the images sorted after each one share its chunk
+        later = np.searchsorted(values, values, side='right') - np.arange(len(values)) - 1
+        position = np.flatnonzero(later)
+        offset = 1
+        while len(position):
+            a = order[position]
+            b = order[position + offset]
+            # The pHash alone rules out nearly every candidate cheaply
+            near = popcount(key[a] ^ key[b]) <= radius
+            a, b = a[near], b[near]
+            near = popcount(table[a] ^ table[b]).max(axis=1) <= radius
+            for i, j in zip(a[near].tolist(), b[near].tolist()):
+                parent[root(i)] = root(j)
+            position = position[later[position] > offset]
+            offset += 1
+    
+    groups = {}
+    for i, name in enumerate(names):
+        groups.setdefault(root(i), []).append(name)
+    return {name: group for group in groups.values() if len(group) > 1 for name in group}
+
+
+class FolderIndex:
+    """Validation results and metadata of a folder's images, saved next to them.
+
+    The index file lets a later scan (or another machine) skip every file
+    whose size and mtime have not changed since it was indexed.
+    """
+
+    FILE_NAME = '.approveit-index.json'
+    # 4: earlier versions could record passing read errors as invalid files
+    VERSION = 4
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.path = os.path.join(folder, self.FILE_NAME)
+        self.entries = {}  # name -> [size, mtime_ns, width, height, format, orientation, hashes, quality]
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == self.VERSION:
+                self.entries = data['files']
+        except (OSError, ValueError, KeyError, AttributeError):
+            pass
+
+    def lookup(self, name, stat):
+        """The stored entry for name if the file is unchanged, else None"""
+        entry = self.entries.get(name)
+        if not entry or entry[0] != stat.st_size or entry[1] != stat.st_mtime_ns:
+            return None
+        if np is not None and entry[2] is not None and entry[6] is None:
+            # Indexed without NumPy - hash it now
+            return None
+        return entry
+
+    def is_image(self, name):
+        entry = self.entries.get(name)
+        return entry is None or entry[2] is not None
+
+    def save(self):
+        """Write the index atomically; a read-only folder just goes without one"""
+        partial_path = self.path + PARTIAL_SUFFIX
+        try:
+            with open(partial_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': self.VERSION, 'files': self.entries}, f, separators=(',', ':'))
+            os.replace(partial_path, self.path)
+        except OSError:
+            pass
+
+
+class FolderIndexer:
+    """Validate and index a list of files on a process pool.
+
+    Files unchanged since the last index are answered from the index file
+    straight away; the rest are fanned out in chunks over all cores. Results
+    stream back through drain() as chunks complete, and the index file is
+    rewritten once everything has been seen. Near-duplicate groups are worked
+    out from the hashes on the same thread and are in bursts by the time
+    finished is set.
+    """
+
+    def __init__(self, folder, names, workers=None, chunk_size=64, burst_radius=10):
+        self.folder = folder
+        self.names = list(names)
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.index = FolderIndex(folder)
+        self.results = queue.Queue()
+        self.stop_event = threading.Event()
+        self.finished = False
+        self.done = 0
+        self.burst_radius = burst_radius
+        self.bursts = {}
+        self.thread = threading.Thread(target=self._run, name="folder-index", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _run(self):
+        try:
+            self._index()
+            if not self.stop_event.is_set():
+                hashes = {}
+                for name in self.names:
+                    entry = self.index.entries.get(name)
+                    if entry and entry[6]:
+                        hashes[name] = entry[6]
+                self.bursts = find_bursts(hashes, self.burst_radius)
+        except Exception:
+            # Indexing is an optimisation - files are still validated on display
+            pass
+        finally:
+            self.results.put(None)
+
+    def _index(self):
+        stale = []
+        known = []
+        for name in self.names:
+            try:
+                entry = self.index.lookup(name, os.stat(os.path.join(self.folder, name)))
+            except OSError:
+                continue
+            if entry is None:
+                stale.append(name)
+            else:
+                known.append((name, entry))
+        if known:
+            self.results.put(known)
+        if not stale:
+            return
+        
+        chunks = [stale[i:i + self.chunk_size] for i in range(0, len(stale), self.chunk_size)]
+        with process_pool(self.workers) as pool:
+            futures = [pool.submit(probe_images, self.folder, chunk) for chunk in chunks]
+            for future in as_completed(futures):
+                if self.stop_event.is_set():
+                    for pending in futures:
+                        pending.cancel()
+                    return
+                results = future.result()
+                self.index.entries.update(results)
+                self.results.put(results)
+        self.index.save()
+
+    def drain(self):
+        """Return the (name, entry) results that arrived since the last call"""
+        results = []
+        while True:
+            try:
+                batch = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if batch is None:
+                self.finished = True
+            else:
+                results.extend(batch)
+        self.done += len(results)
+        return results
+
+
+def scaled_size(size, zoom_factor):
+    width, height = size
+    return max(1, int(width * zoom_factor)), max(1, int(height * zoom_factor))
+
+
+# Zoom the review window opens images at
+DEFAULT_ZOOM = 0.4
+
+
+def preview_size(original_size, edge, zoom):
+    """Size of an image's cached preview: the longest side at least edge, and at
+    least zoom times the original so views up to that zoom need no decode"""
+    return scaled_size(original_size, min(1.0, max(edge / max(original_size), zoom)))
+
+
+def reduce_decode(image, min_size):
+    """Set up a freshly opened image to decode only as many pixels as min_size needs.
+
+    JPEG uses Pillow's draft mode (DCT scaling by 1/2, 1/4 or 1/8) and JPEG 2000
+    drops resolution levels; other formats still decode at full size. Must be
+    called before load(); image.size changes to the reduced size.
+    """
+    width, height = image.size
+    scale = min(width // max(1, min_size[0]), height // max(1, min_size[1]))
+    if scale < 2:
+        return
+    if image.format == 'JPEG':
+        image.draft(image.mode if image.mode in ('RGB', 'L') else None, min_size)
+    elif image.format == 'JPEG2000':
+        image.reduce = scale.bit_length() - 1
+
+
+# Sources this large are reduced as they are decoded rather than kept at full size
+LARGE_IMAGE_PIXELS = 64_000_000
+# Formats that can't be decoded in bands are decoded whole, one at a time - across
+# worker processes too, so peak memory doesn't grow with the number of cores
+LARGE_DECODE_LOCK = multiprocessing.get_context('spawn').Lock()
+# Held while Image.MAX_IMAGE_PIXELS is lifted for one open
+OPEN_LARGE_LOCK = threading.Lock()
+
+
+def open_image(path):
+    """Image.open that also opens sources past Pillow's decompression bomb limit.
+
+    Pillow refuses images over twice Image.MAX_IMAGE_PIXELS before reading any
+    pixels. Those are still real images, just too big to decode whole, and
+    decode_reduced never does, so they are opened again with the limit lifted
+    for that one call. Decode them with decode_reduced only.
+    """
+    try:
+        return Image.open(path)
+    except Image.DecompressionBombError:
+        with OPEN_LARGE_LOCK:
+            limit = Image.MAX_IMAGE_PIXELS
+            Image.MAX_IMAGE_PIXELS = None
+            try:
+                return Image.open(path)
+            finally:
+                Image.MAX_IMAGE_PIXELS = limit
+
+
+def decode_reduced(image, min_size):
+    """Decode a freshly opened image, keeping large sources no bigger than min_size needs.
+
+    Small images are loaded as they are (after reduce_decode). Large ones come
+    back box-reduced by an integer factor that keeps them at least min_size:
+    uncompressed TIFFs are decoded band by band and never exist at full size,
+    other formats are decoded whole under LARGE_DECODE_LOCK and closed as soon
+    as they are reduced. Use the returned image, not the argument.
+    """
+    reduce_decode(image, min_size)
+    width, height = image.size
+    factor = min(width // max(1, min_size[0]), height // max(1, min_size[1]))
+    if width * height < LARGE_IMAGE_PIXELS or factor < 2:
+        image.load()
+        return image
+    banded = banded_decode(image, factor)
+    if banded is not None:
+        return banded
+    with LARGE_DECODE_LOCK:
+        image.load()
+        reduced = image.reduce(factor)
+        image.close()
+    return reduced
+
+
+def banded_decode(image, factor, band_bytes=32 * 1024 * 1024):
+    """Box-reduce an uncompressed striped or tiled TIFF by factor, one band of rows at a time.
+
+    The file is memory-mapped and only the rows of each strip or tile that fall
+    in the current band are unpacked; every band is a whole number of reduction
+    boxes high, so the reduced bands join without seams. Pages of the mapping
+    are dropped once unpacked, so peak memory is one band plus the result.
+    Returns None for anything else (compressed or planar data, other formats),
+    which has to be decoded whole.
+    """
+    if (image.format != 'TIFF' or getattr(image, 'use_load_libtiff', True)
+            or image.tag_v2.get(284, 1) != 1 or image.mode not in ('L', 'LA', 'RGB', 'RGBA', 'CMYK')):
+        return None
+    tiles = sorted(image.tile, key=lambda tile: (tile[1][1], tile[1][0]))
+    if not tiles or any(tile[0] != 'raw' for tile in tiles):
+        return None
+    bits = image.tag_v2.get(258, (1,))
+    bits = tuple(bits) if isinstance(bits, (tuple, list)) else (bits,)
+    if len(bits) == 1:
+        bits *= image.tag_v2.get(277, 1)
+    bits_per_pixel = sum(bits)
+
+    width, height = image.size
+    band_rows = max(factor, band_bytes // (width * 4) // factor * factor)
+    reduced = Image.new(image.mode, (-(-width // factor), -(-height // factor)))
+    first = 0
+    with open(image.filename, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        data = memoryview(mapped)
+        release = hasattr(mmap, 'MADV_DONTNEED')
+        try:
+            for top in range(0, height, band_rows):
+                bottom = min(height, top + band_rows)
+                band = Image.new(image.mode, (width, bottom - top))
+                while tiles[first][1][3] <= top:
+                    first += 1
+                for _, (x0, y0, x1, y1), offset, (rawmode, stride, *_) in tiles[first:]:
+                    if y0 >= bottom:
+                        break
+                    # Unpack only this band's rows of the strip or tile
+                    stride = stride or (x1 - x0) * bits_per_pixel // 8
+                    rows = (max(y0, top), min(y1, bottom))
+                    start = offset + (rows[0] - y0) * stride
+                    piece = Image.frombuffer(image.mode, (x1 - x0, rows[1] - rows[0]),
+                                             data[start:start + (rows[1] - rows[0]) * stride],
+                                             'raw', rawmode, stride, 1)
+                    band.paste(piece, (x0, rows[0] - top))
+                    del piece
+                    # Mapped pages count as resident until dropped; refaulting them is harmless
+                    if release:
+                        page = start - start % mmap.PAGESIZE
+                        mapped.madvise(mmap.MADV_DONTNEED, page, start + (rows[1] - rows[0]) * stride - page)
+                reduced.paste(band.reduce(factor), (0, top // factor))
+        finally:
+            data.release()
+    return reduced
+
+
+def default_cache_dir():
+    """Per-user cache directory for ApproveIT"""
+    if os.name == 'nt':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'approveit')
+
+
+def encode_preview(preview):
+    """Compress a preview for the cache - JPEG where possible, WebP for alpha"""
+    buffer = io.BytesIO()
+    if preview.mode in ('RGB', 'L'):
+        preview.save(buffer, 'JPEG', quality=90)
+    else:
+        preview.save(buffer, 'WEBP', lossless=False, quality=90)
+    return buffer.getvalue()
+
+
+def render_preview(image_path, edge, zoom):
+    """Decode one image into an encoded preview (see preview_size); runs in worker processes.
+
+    Returns (path, stat, data, width, height) or None if the file is not a
+    readable image.
+    """
+    try:
+        stat = os.stat(image_path)
+        with open_image(image_path) as image:
+            original_size = image.size
+            size = preview_size(original_size, edge, zoom)
+            preview = decode_reduced(image, size).resize(size, Image.LANCZOS, reducing_gap=3.0)
+        return image_path, stat, encode_preview(preview), original_size[0], original_size[1]
+    except (OSError, ValueError):
+        return None
+
+
+class PreviewCache:
+    """Downscaled previews stored in a sidecar SQLite database.
+
+    Entries are keyed on (path, size, mtime, preview sizing) so an edited file
+    never serves a stale preview, and the least recently used entries are
+    evicted once the database grows past max_bytes. Writes go through a
+    background thread so storing a preview never blocks the caller.
+    """
+
+    def __init__(self, db_path=None, max_bytes=1024 * 1024 * 1024):
+        if db_path is None:
+            db_path = os.path.join(default_cache_dir(), 'previews.sqlite')
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS previews ("
+            " key TEXT PRIMARY KEY, data BLOB NOT NULL, nbytes INTEGER NOT NULL,"
+            " width INTEGER NOT NULL, height INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS previews_last_used ON previews (last_used)")
+        self.conn.commit()
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM previews").fetchone()[0]
+        self.writes = queue.Queue()
+        self.writer = threading.Thread(target=self._write_loop, name="preview-cache", daemon=True)
+        self.writer.start()
+
+    @staticmethod
+    def make_key(image_path, stat, sizing):
+        return f"{os.path.abspath(image_path)}|{stat.st_size}|{stat.st_mtime_ns}|{sizing}"
+
+    def get(self, image_path, stat, sizing):
+        """Return (preview image, original size) or None"""
+        key = self.make_key(image_path, stat, sizing)
+        try:
+            with self.lock:
+                row = self.conn.execute(
+                    "SELECT data, width, height FROM previews WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                self.conn.execute("UPDATE previews SET last_used = ? WHERE key = ?", (time.time(), key))
+                self.conn.commit()
+        except sqlite3.Error:
+            return None
+        data, width, height = row
+        try:
+            preview = Image.open(io.BytesIO(data))
+            preview.load()
+        except OSError:
+            return None
+        return preview, (width, height)
+
+    def put_async(self, image_path, stat, sizing, preview, original_size):
+        """Encode and store a preview on the writer thread"""
+        self.writes.put((self.make_key(image_path, stat, sizing), preview, original_size))
+
+    def _write_loop(self):
+        while True:
+            item = self.writes.get()
+            if item is None:
+                return
+            key, preview, (width, height) = item
+            try:
+                self.store(key, encode_preview(preview), width, height)
+            except (OSError, ValueError, sqlite3.Error):
+                # A preview we can't store is just a cache miss next time
+                continue
+
+    def store(self, key, data, width, height):
+        """Insert an encoded preview right away"""
+        with self.lock:
+            old = self.conn.execute("SELECT nbytes FROM previews WHERE key = ?", (key,)).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO previews VALUES (?, ?, ?, ?, ?, ?)",
+                (key, data, len(data), width, height, time.time())
+            )
+            self.total_bytes += len(data) - (old[0] if old else 0)
+            self._evict()
+            self.conn.commit()
+
+    def contains(self, key):
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM previews WHERE key = ?", (key,)).fetchone() is not None
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes:
+            rows = self.conn.execute(
+                "SELECT key, nbytes FROM previews ORDER BY last_used, rowid LIMIT 64"
+            ).fetchall()
+            if not rows:
+                self.total_bytes = 0
+                return
+            # Only as many as it takes to get back under the limit
+            victims = []
+            for key, nbytes in rows:
+                victims.append((key,))
+                self.total_bytes -= nbytes
+                if self.total_bytes <= self.max_bytes:
+                    break
+            self.conn.executemany("DELETE FROM previews WHERE key = ?", victims)
+
+    def close(self):
+        self.writes.put(None)
+        self.writer.join(timeout=2)
+        with self.lock:
+            self.conn.close()
+
+
+class ImageLoader:
+    """Produce zoomed images, reading from the preview cache before the original.
+
+    A preview with its longest edge at preview_edge, and at least preview_zoom
+    of the original so the default view fits, is kept for every image decoded;
+    any zoom level that fits inside it is served from the preview.
+    Originals go through decode_reduced so small zooms skip most of the decode
+    and very large files are never held in memory at full size.
+    """
+
+    def __init__(self, preview_cache=None, preview_edge=2048, preview_zoom=DEFAULT_ZOOM, max_pixels=None):
+        self.preview_cache = preview_cache
+        self.preview_edge = preview_edge
+        self.preview_zoom = preview_zoom
+        # Previews made under other sizing rules are cached under other keys
+        self.preview_key = f"{preview_edge}@{preview_zoom:g}"
+        self.max_pixels = max_pixels
+
+    def __call__(self, image_path, zoom_factor):
+        base, original_size = self.load_base(image_path, zoom_factor, self.max_pixels)
+        start = time.perf_counter()
+        image = base.resize(scaled_size(original_size, zoom_factor), Image.LANCZOS, reducing_gap=3.0)
+        PERF.add('resize', start)
+        return image
+
+    def load_base(self, image_path, zoom_factor, max_pixels=None):
+        """Return (image, original size) where image is at least as large as the zoom needs.
+
+        The image is the cached preview when that is big enough, otherwise the
+        original decoded at the smallest reduced resolution that covers the zoom.
+        With max_pixels set, zooms producing a larger bitmap raise ValueError
+        before anything is decoded.
+        """
+        stat = os.stat(image_path)
+        cached = None
+        if self.preview_cache:
+            cached = self.preview_cache.get(image_path, stat, self.preview_key)
+        if cached:
+            preview, original_size = cached
+            target_size = scaled_size(original_size, zoom_factor)
+            self.check_pixels(target_size, max_pixels)
+            if target_size[0] <= preview.width and target_size[1] <= preview.height:
+                PERF.count('preview cache', True)
+                return cached
+        if self.preview_cache:
+            PERF.count('preview cache', False)
+
+        start = time.perf_counter()
+        with open_image(image_path) as image:
+            original_size = image.size
+            target_size = scaled_size(original_size, zoom_factor)
+            self.check_pixels(target_size, max_pixels)
+            cached_size = preview_size(original_size, self.preview_edge, self.preview_zoom)
+            
+            # Decode only what the zoom (and a missing preview) actually needs
+            needed_size = target_size
+            if self.preview_cache and cached is None:
+                needed_size = (max(target_size[0], cached_size[0]), max(target_size[1], cached_size[1]))
+            decoded = decode_reduced(image, needed_size)
+            PERF.add('decode', start)
+            if self.preview_cache and cached is None:
+                preview = decoded.resize(cached_size, Image.LANCZOS, reducing_gap=3.0)
+                self.preview_cache.put_async(image_path, stat, self.preview_key, preview, original_size)
+            # The opened file's own raster goes away with it
+            return (decoded.copy() if decoded is image else decoded), original_size
+
+    def thumbnail(self, image_path, edge):
+        """Small version of image_path with its longest side at most edge, for the grid view"""
+        if self.preview_cache:
+            cached = self.preview_cache.get(image_path, os.stat(image_path), self.preview_key)
+            PERF.count('preview cache', cached is not None)
+            if cached:
+                preview = cached[0]
+                preview.thumbnail((edge, edge), Image.BILINEAR)
+                return preview
+        start = time.perf_counter()
+        with open_image(image_path) as image:
+            thumbnail = decode_reduced(image, (edge, edge))
+            thumbnail.thumbnail((edge, edge), Image.BILINEAR)
+            PERF.add('decode', start)
+            return thumbnail.copy() if thumbnail is image else thumbnail
+
+
+    @staticmethod
+    def check_pixels(size, max_pixels):
+        if max_pixels and size[0] * size[1] > max_pixels:
+            # Zoomed views this large are rendered tile by tile, never as one bitmap
+            raise ValueError(f"{size[0]}x{size[1]} is too large to rasterize whole")
+
+
+class ImagePyramid:
+    """In-memory resolution levels of one image, each half the size of the previous.
+
+    Zoom steps resample from the smallest level that is still at least as large
+    as the target, so a step costs a resize of roughly the output size instead
+    of a decode and resample of the original.
+    """
+
+    def __init__(self, image_path, base, original_size, min_edge=256):
+        self.image_path = image_path
+        self.original_size = original_size
+        self.levels = [base]
+        while max(self.levels[-1].size) >= min_edge * 2:
+            self.levels.append(self.levels[-1].reduce(2))
+
+    def covers(self, zoom_factor):
+        """True if the largest level can render zoom_factor without losing detail"""
+        base = self.levels[0]
+        if base.size == self.original_size:
+            return True
+        width, height = scaled_size(self.original_size, zoom_factor)
+        return width <= base.width and height <= base.height
+
+    def render(self, zoom_factor, fast=False):
+        target_size = scaled_size(self.original_size, zoom_factor)
+        source = self.levels[0]
+        for level in self.levels[1:]:
+            if level.width < target_size[0] or level.height < target_size[1]:
+                break
+            source = level
+        start = time.perf_counter()
+        image = source.resize(target_size, Image.NEAREST if fast else Image.LANCZOS)
+        PERF.add('resize', start)
+        return image
+
+    def render_region(self, zoom_factor, box, fast=False):
+        """Render box (in zoomed-image pixels) of the image at zoom_factor"""
+        left, top, right, bottom = box
+        width, height = right - left, bottom - top
+        source = self.levels[0]
+        for level in self.levels[1:]:
+            if level.width < self.original_size[0] * zoom_factor or level.height < self.original_size[1] * zoom_factor:
+                break
+            source = level
+        # Map the box back onto the chosen level and let resize crop while resampling
+        scale = source.width / (self.original_size[0] * zoom_factor)
+        source_box = (left * scale, top * scale, right * scale, bottom * scale)
+        start = time.perf_counter()
+        image = source.resize((width, height), Image.NEAREST if fast else Image.LANCZOS, box=source_box)
+        PERF.add('resize', start)
+        return image
+
+
+class LRUCache:
+    """Tiny least-recently-used mapping with a fixed number of entries"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.items = OrderedDict()
+
+    def get(self, key):
+        value = self.items.get(key)
+        if value is not None:
+            self.items.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.items[key] = value
+        self.items.move_to_end(key)
+        while len(self.items) > self.capacity:
+            self.items.popitem(last=False)
+
+    def clear(self):
+        self.items.clear()
+
+
+class PhotoPool:
+    """Reusable Tk bitmaps for the single image view, keyed by mode and size.
+
+    A PhotoImage allocates a Tk bitmap that is only freed when Python collects
+    it. In a folder from one camera every image at a given zoom has the same
+    size, so a spare bitmap of that size is updated in place with paste()
+    instead. take() never returns the bitmap currently on screen, so a paste
+    is never seen half done. Bitmaps larger than the byte budget aren't kept.
+    """
+
+    def __init__(self, per_size=2, budget_bytes=96 * 1024 * 1024):
+        self.per_size = per_size
+        self.budget_bytes = budget_bytes
+        self.photos = OrderedDict()  # (mode, size) -> [PhotoImage, ...]
+        self.nbytes = 0
+
+    @staticmethod
+    def photo_bytes(key):
+        _, (width, height) = key
+        return width * height * 4
+
+    def take(self, image, shown=None):
+        """Return a PhotoImage showing image, other than shown"""
+        key = (image.mode, image.size)
+        spares = self.photos.get(key, [])
+        for photo in spares:
+            if photo is not shown:
+                self.photos.move_to_end(key)
+                PERF.count('photo pool', True)
+                photo.paste(image)
+                return photo
+        PERF.count('photo pool', False)
+        photo = ImageTk.PhotoImage(image)
+        if len(spares) < self.per_size and self.photo_bytes(key) <= self.budget_bytes:
+            self.photos[key] = spares + [photo]
+            self.photos.move_to_end(key)
+            self.nbytes += self.photo_bytes(key)
+            self._evict(key)
+        return photo
+
+    def _evict(self, keep):
+        for key in list(self.photos):
+            if self.nbytes <= self.budget_bytes:
+                break
+            if key != keep:
+                self.nbytes -= self.photo_bytes(key) * len(self.photos.pop(key))
+
+    def clear(self):
+        self.photos.clear()
+        self.nbytes = 0
+
+
+class ImagePrefetcher:
+    """Decode and pre-scale upcoming images on a background worker pool.
+
+    Prepared images are kept in a small LRU bounded by a byte budget. Each call
+    to schedule() describes the wanted neighbourhood; queued jobs that fall out
+    of it are cancelled so that jumping around the list never piles up work.
+    PhotoImage conversion stays on the Tk thread - workers only return PIL images.
+    """
+
+    def __init__(self, loader, workers=2, ahead=3, behind=1, budget_bytes=256 * 1024 * 1024):
+        self.loader = loader
+        self.ahead = ahead
+        self.behind = behind
+        self.budget_bytes = budget_bytes
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self.lock = threading.Lock()
+        self.cache = OrderedDict()  # key -> prepared PIL image
+        self.cache_bytes = 0
+        self.pending = {}  # key -> Future
+        self.wanted = set()
+
+    @staticmethod
+    def make_key(image_path, zoom_factor):
+        # Zoom is accumulated in 0.1 steps, so round away float noise
+        return (image_path, round(zoom_factor, 3))
+
+    @staticmethod
+    def image_bytes(image):
+        return image.width * image.height * len(image.getbands())
+
+    def get(self, image_path, zoom_factor):
+        """Return a prepared image, waiting for an in-flight job if there is one"""
+        key = self.make_key(image_path, zoom_factor)
+        with self.lock:
+            image = self.cache.get(key)
+            if image is not None:
+                self.cache.move_to_end(key)
+                PERF.count('prefetch', True)
+                return image
+            future = self.pending.get(key)
+        PERF.count('prefetch', future is not None and not future.cancelled())
+        if future is None or future.cancelled():
+            return None
+        try:
+            return future.result()
+        except Exception:
+            return None
+
+    def schedule(self, image_paths, zoom_factor):
+        """Prefetch image_paths (nearest first) and cancel everything else"""
+        keys = [self.make_key(path, zoom_factor) for path in image_paths]
+        with self.lock:
+            self.wanted = set(keys)
+            for key, future in list(self.pending.items()):
+                if key not in self.wanted and future.cancel():
+                    del self.pending[key]
+            for key in keys:
+                if key in self.cache or key in self.pending:
+                    continue
+                self.pending[key] = self.executor.submit(self._run, key)
+
+    def _run(self, key):
+        image_path, zoom_factor = key
+        try:
+            image = self.loader(image_path, zoom_factor)
+        except Exception:
+            with self.lock:
+                self.pending.pop(key, None)
+            raise
+        with self.lock:
+            self.pending.pop(key, None)
+            # Only keep results that are still wanted when the job finishes
+            if key in self.wanted and key not in self.cache:
+                self.cache[key] = image
+                self.cache_bytes += self.image_bytes(image)
+                self._evict()
+        return image
+
+    def _evict(self):
+        while self.cache_bytes > self.budget_bytes and len(self.cache) > 1:
+            _, image = self.cache.popitem(last=False)
+            self.cache_bytes -= self.image_bytes(image)
+
+    def discard(self, image_path):
+        """Forget every prepared version of image_path (e.g. after it was moved)"""
+        with self.lock:
+            for key in [k for k in self.cache if k[0] == image_path]:
+                self.cache_bytes -= self.image_bytes(self.cache.pop(key))
+
+    def clear(self):
+        with self.lock:
+            for future in self.pending.values():
+                future.cancel()
+            self.pending.clear()
+            self.wanted = set()
+            self.cache.clear()
+            self.cache_bytes = 0
+
+    def shutdown(self):
+        self.clear()
+        self.executor.shutdown(wait=False)
+
+
+class ThumbnailCache:
+    """Grid-view thumbnails made on a background pool and kept in a bounded LRU.
+
+    get() never blocks: a missing thumbnail is queued and None returned, and
+    take_ready() tells the grid when finished jobs are worth a redraw. want()
+    cancels queued jobs for cells that scrolled out of view before a worker
+    got to them, so flinging through a large folder only decodes what stops
+    on screen. Like the prefetcher, workers only ever return PIL images.
+    """
+
+    def __init__(self, loader, edge=144, workers=3, capacity=1024):
+        self.loader = loader
+        self.edge = edge
+        self.capacity = capacity
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnails")
+        self.lock = threading.Lock()
+        self.cache = OrderedDict()  # path -> PIL thumbnail, None when the file can't be read
+        self.pending = {}  # path -> Future
+        self.ready = False
+
+    @property
+    def busy(self):
+        return bool(self.pending)
+
+    def get(self, image_path):
+        """Return the thumbnail of image_path, or None while it is being made"""
+        with self.lock:
+            if image_path in self.cache:
+                self.cache.move_to_end(image_path)
+                PERF.count('thumbnails', True)
+                return self.cache[image_path]
+            PERF.count('thumbnails', False)
+            if image_path not in self.pending:
+                self.pending[image_path] = self.executor.submit(self._run, image_path)
+        return None
+
+    def want(self, image_paths):
+        """Cancel queued jobs for everything not in image_paths"""
+        wanted = set(image_paths)
+        with self.lock:
+            for image_path, future in list(self.pending.items()):
+                if image_path not in wanted and future.cancel():
+                    del self.pending[image_path]
+
+    def take_ready(self):
+        """True once per batch of thumbnails finished since the last call"""
+        with self.lock:
+            ready, self.ready = self.ready, False
+        return ready
+
+    def _run(self, image_path):
+        try:
+            thumbnail = self.loader.thumbnail(image_path, self.edge)
+        except Exception:
+            # Drawn as an empty cell; the indexer or the single view reports it
+            thumbnail = None
+        with self.lock:
+            self.pending.pop(image_path, None)
+            self.cache[image_path] = thumbnail
+            while len(self.cache) > self.capacity:
+                self.cache.popitem(last=False)
+            self.ready = True
+
+    def clear(self):
+        with self.lock:
+            for future in self.pending.values():
+                future.cancel()
+            self.pending.clear()
+            self.cache.clear()
+            self.ready = False
+
+    def shutdown(self):
+        self.clear()
+        self.executor.shutdown(wait=False)
+
+
+class ReviewQueue:
+    """The images still waiting for review, in folder order.
+
+    Names live in append-only slots that are never physically removed; a
+    per-slot flag says whether the image is still queued. A Fenwick tree over
+    the flags maps a position in the queue to its slot and back in O(log n),
+    so removing the current image, restoring an undone one to its old place
+    and indexing are independent of folder size, and len() is O(1).
+    """
+
+    def __init__(self, names=()):
+        self.names = []  # slot -> file name
+        self.queued = bytearray()  # slot -> 1 while waiting for review
+        self.tree = [0]  # 1-based Fenwick tree of the queued flags
+        self.slots = {}  # file name -> its most recent slot
+        self.count = 0
+        self.journal = None  # called with every change while a session file is open
+        self.extend(names)
+
+    @classmethod
+    def from_state(cls, names, removed):
+        """Rebuild a queue from its slot names and the slots no longer queued, in O(n)"""
+        review_queue = cls()
+        review_queue.names = list(names)
+        review_queue.queued = bytearray([1]) * len(names)
+        for slot in removed:
+            review_queue.queued[slot] = 0
+        tree = [0] + list(review_queue.queued)
+        for index in range(1, len(tree)):
+            parent = index + (index & -index)
+            if parent < len(tree):
+                tree[parent] += tree[index]
+        review_queue.tree = tree
+        review_queue.slots = {name: slot for slot, name in enumerate(review_queue.names)}
+        review_queue.count = len(names) - len(set(removed))
+        return review_queue
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, position):
+        return self.names[self.slot_at(position)]
+
+    def __iter__(self):
+        for slot, queued in enumerate(self.queued):
+            if queued:
+                yield self.names[slot]
+
+    def __contains__(self, name):
+        slot = self.slots.get(name)
+        return slot is not None and self.queued[slot] == 1
+
+    def _add(self, slot, delta):
+        index = slot + 1
+        while index < len(self.tree):
+            self.tree[index] += delta
+            index += index & -index
+
+    def _prefix(self, slot):
+        """Number of queued images in slots [0, slot)"""
+        total = 0
+        index = slot
+        while index > 0:
+            total += self.tree[index]
+            index -= index & -index
+        return total
+
+    def append(self, name):
+        """Queue a name at the end and return its slot"""
+        if self.journal:
+            self.journal({'op': 'add', 'names': [name]})
+        return self._append(name)
+
+    def _append(self, name):
+        slot = len(self.names)
+        index = slot + 1
+        # A Fenwick node covers (index - lowbit, index]; sum the part already stored
+        self.tree.append(1 + self._prefix(slot) - self._prefix(index - (index & -index)))
+        self.names.append(name)
+        self.queued.append(1)
+        self.slots[name] = slot
+        self.count += 1
+        return slot
+
+    def extend(self, names):
+        names = list(names)
+        if self.journal and names:
+            self.journal({'op': 'add', 'names': names})
+        for name in names:
+            self._append(name)
+
+    def slot_at(self, position):
+        """Slot of the image at a queue position"""
+        if position < 0:
+            position += self.count
+        if not 0 <= position < self.count:
+            raise IndexError("review queue index out of range")
+        slot = 0
+        step = 1 << (len(self.tree) - 1).bit_length()
+        remaining = position + 1
+        while step:
+            index = slot + step
+            if index < len(self.tree) and self.tree[index] < remaining:
+                slot = index
+                remaining -= self.tree[index]
+            step >>= 1
+        return slot
+
+    def position_of(self, slot):
+        """Queue position of a queued slot"""
+        return self._prefix(slot)
+
+    def remove_at(self, position):
+        """Take the image at a queue position out of the queue and return its slot"""
+        slot = self.slot_at(position)
+        self.queued[slot] = 0
+        self._add(slot, -1)
+        self.count -= 1
+        if self.journal:
+            self.journal({'op': 'remove', 'slot': slot})
+        return slot
+
+    def pop(self, position=-1):
+        return self.names[self.remove_at(position)]
+
+    def restore(self, slot):
+        """Put a removed slot back in the queue and return its position"""
+        if not self.queued[slot]:
+            self.queued[slot] = 1
+            self._add(slot, 1)
+            self.count += 1
+            if self.journal:
+                self.journal({'op': 'restore', 'slot': slot})
+        return self.position_of(slot)
+
+    def is_queued(self, slot):
+        return 0 <= slot < len(self.queued) and self.queued[slot] == 1
+
+    def discard(self, name):
+        """Drop a name from the queue if it is there; returns its old position or None"""
+        slot = self.slots.get(name)
+        if slot is None or not self.queued[slot]:
+            return None
+        position = self.position_of(slot)
+        self.remove_at(position)
+        return position
+
+    def move_to_end(self, name):
+        """Requeue a queued name behind everything else"""
+        if self.discard(name) is not None:
+            self.append(name)
+
+
+class UndoRecord:
+    """One decision in the undo log.
+
+    Records use __slots__ and store folders as indices into a shared intern
+    table, so a session with 100k+ decisions stays small. position is the
+    file's ReviewQueue slot, not a queue position: slots never move, so undo
+    can put the file straight back there however the queue changed since.
+    group is the slot naming the burst or selection decided together, if any.
+    """
+
+    __slots__ = ('file', 'source_id', 'destination_id', 'action', 'position', 'job', 'deferred', 'group')
+
+    folders = []  # interned folder paths shared by every record
+    folder_ids = {}
+
+    def __init__(self, file, source, destination, action, position, job=None, deferred=False, group=None):
+        self.file = file
+        self.source_id = self.intern_folder(source)
+        self.destination_id = self.intern_folder(destination)
+        self.action = action
+        self.position = position
+        self.job = job
+        self.deferred = deferred
+        self.group = group  # records decided together share this and are undone together
+
+    @classmethod
+    def intern_folder(cls, folder):
+        folder_id = cls.folder_ids.get(folder)
+        if folder_id is None:
+            folder_id = cls.folder_ids[folder] = len(cls.folders)
+            cls.folders.append(folder)
+        return folder_id
+
+    @property
+    def source(self):
+        return self.folders[self.source_id]
+
+    @property
+    def destination(self):
+        return self.folders[self.destination_id]
+
+
+class UndoLog:
+    """Unbounded undo/redo history of decisions"""
+
+    def __init__(self):
+        self.done = []
+        self.undone = []
+        self.journal = None  # called with every change while a session file is open
+
+    def __len__(self):
+        return len(self.done)
+
+    def __iter__(self):
+        return iter(self.done)
+
+    def record(self, record, keep_redo=False):
+        """Add a new decision; a fresh decision makes the redo history obsolete"""
+        if self.journal:
+            self.journal({'op': 'record', 'record': [record.file, record.source, record.destination, record.action,
+                                                     record.position, record.deferred, record.group],
+                          'keep_redo': keep_redo})
+        self.done.append(record)
+        if not keep_redo:
+            self.undone.clear()
+
+    def pop_undo(self, group=None):
+        """Take the last decision, or only one that belongs to group when given"""
+        if not self.done or (group is not None and self.done[-1].group != group):
+            return None
+        if self.journal:
+            self.journal({'op': 'pop_undo'})
+        return self.done.pop()
+
+    def push_redo(self, record):
+        if self.journal:
+            self.journal({'op': 'push_redo'})
+        self.undone.append(record)
+
+    def pop_redo(self, group=None):
+        if not self.undone or (group is not None and self.undone[-1].group != group):
+            return None
+        if self.journal:
+            self.journal({'op': 'pop_redo'})
+        return self.undone.pop()
+
+    def can_redo(self):
+        return bool(self.undone)
+
+    def remove(self, record):
+        index = self.done.index(record)
+        if self.journal:
+            self.journal({'op': 'remove_record', 'index': index})
+        del self.done[index]
+
+    def settle_deferred(self):
+        """Mark every tagged decision as handed over for moving"""
+        if self.journal:
+            self.journal({'op': 'settle'})
+        for record in self.done:
+            record.deferred = False
+
+    def drop_deferred(self):
+        """Forget decisions that were only tagged and never moved"""
+        if self.journal:
+            self.journal({'op': 'drop_deferred'})
+        self.done = [record for record in self.done if not record.deferred]
+        self.undone = [record for record in self.undone if not record.deferred]
+
+
+class SessionLog:
+    """Append-only record of a review session, kept next to the images.
+
+    The file starts with a snapshot of the queue slots, the undo/redo history
+    and the view, followed by one JSON line per change as it happens. Loading
+    replays it, so reopening a folder restores the session without scanning
+    or validating anything first. A torn last line from a crash is ignored;
+    compact() rewrites the file as a single snapshot.
+    """
+
+    FILE_NAME = '.approveit-session.jsonl'
+    VERSION = 1
+
+    def __init__(self, folder):
+        self.path = os.path.join(folder, self.FILE_NAME)
+        self.file = None
+        self.events = 0  # lines written after the snapshot
+
+    def load(self):
+        """Replay the file; returns (queue, undo log, auto-rejected names, view) or None without a session"""
+        try:
+            f = open(self.path, encoding='utf-8')
+        except OSError:
+            return None
+        image_files = ReviewQueue()
+        undo_log = UndoLog()
+        auto_rejected = []
+        view = None
+        popped = None
+        with f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    # Cut off by a crash mid-write - everything before it is good
+                    break
+                op = event['op']
+                if op == 'snapshot':
+                    if event.get('version') != self.VERSION:
+                        return None
+                    folders = event['folders']
+                    image_files = ReviewQueue.from_state(event['names'], event['removed'])
+                    undo_log = UndoLog()
+                    undo_log.done = [self.unpack(row, folders) for row in event['done']]
+                    undo_log.undone = [self.unpack(row, folders) for row in event['undone']]
+                    auto_rejected = event['auto_rejected']
+                    view = event['view']
+                elif op == 'add':
+                    image_files.extend(event['names'])
+                elif op == 'remove':
+                    image_files.remove_at(image_files.position_of(event['slot']))
+                elif op == 'restore':
+                    image_files.restore(event['slot'])
+                elif op == 'record':
+                    file, source, destination, action, slot, deferred, group = event['record']
+                    undo_log.record(UndoRecord(file, source, destination, action, slot, None, deferred, group),
+                                    keep_redo=event['keep_redo'])
+                elif op == 'pop_undo':
+                    popped = undo_log.pop_undo()
+                elif op == 'push_redo':
+                    popped.deferred = False
+                    undo_log.push_redo(popped)
+                elif op == 'pop_redo':
+                    undo_log.pop_redo()
+                elif op == 'remove_record':
+                    del undo_log.done[event['index']]
+                elif op == 'settle':
+                    undo_log.settle_deferred()
+                elif op == 'drop_deferred':
+                    undo_log.drop_deferred()
+                elif op == 'auto_reject':
+                    auto_rejected.append(event['name'])
+                elif op == 'unreject':
+                    auto_rejected.remove(event['name'])
+                elif op == 'view':
+                    view = event['view']
+                self.events = 0 if op == 'snapshot' else self.events + 1
+        return image_files, undo_log, auto_rejected, view
+
+    @staticmethod
+    def unpack(row, folders):
+        file, source_id, destination_id, action, slot, deferred, group = row
+        return UndoRecord(file, folders[source_id], folders[destination_id], action, slot, None, bool(deferred), group)
+
+    def open(self):
+        """Start appending to the file"""
+        self.file = open(self.path, 'a', encoding='utf-8')
+
+    def write(self, event):
+        if self.file is None:
+            return
+        self.file.write(json.dumps(event, separators=(',', ':')) + "\n")
+        # Flushed per change so a crash loses at most the line being written
+        self.file.flush()
+        self.events += 1
+
+    def compact(self, image_files, undo_log, auto_rejected, view=None):
+        """Replace the file with one snapshot of the current state"""
+        pack = lambda record: [record.file, record.source_id, record.destination_id, record.action,
+                               record.position, int(record.deferred), record.group]
+        snapshot = {
+            'op': 'snapshot',
+            'version': self.VERSION,
+            'names': image_files.names,
+            'removed': [slot for slot, queued in enumerate(image_files.queued) if not queued],
+            'folders': UndoRecord.folders,
+            'done': [pack(record) for record in undo_log.done],
+            'undone': [pack(record) for record in undo_log.undone],
+            'auto_rejected': auto_rejected,
+            'view': view,
+        }
+        if self.file:
+            self.file.close()
+        partial_path = self.path + PARTIAL_SUFFIX
+        with open(partial_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(snapshot, separators=(',', ':')) + "\n")
+        os.replace(partial_path, self.path)
+        self.events = 0
+        if self.file:
+            self.open()
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+
+def default_reviewer():
+    """Who is reviewing: APPROVEIT_REVIEWER, else the login name"""
+    try:
+        return os.environ.get('APPROVEIT_REVIEWER') or getpass.getuser()
+    except (KeyError, OSError):
+        return "unknown"
+
+
+class DecisionReport:
+    """Audit trail of the decisions on a folder: file, decision, time, reviewer, comment.
+
+    Every decision, undo and comment is appended to .approveit-report.jsonl
+    next to the images by a background thread that writes whatever queued up
+    since its last write in one go, so recording costs the caller a dict update
+    and a queue put. The latest decision and comment of each file are also
+    kept in memory; export() writes those, without a pass over the folders.
+    """
+
+    FILE_NAME = '.approveit-report.jsonl'
+    FIELDS = ('file', 'decision', 'time', 'reviewer', 'comment')
+
+    def __init__(self, folder, reviewer=None):
+        self.path = os.path.join(folder, self.FILE_NAME)
+        self.reviewer = reviewer or default_reviewer()
+        self.rows = OrderedDict()  # file -> latest {field: value}
+        self.events = queue.Queue()
+        self.writer = None
+        self.file = None
+
+    def load(self):
+        """Pick up the rows of earlier sessions; a torn last line is ignored"""
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        self._apply(json.loads(line))
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        except FileNotFoundError:
+            pass
+        return self
+
+    def open(self):
+        self.file = open(self.path, 'a', encoding='utf-8')
+        self.writer = threading.Thread(target=self._write_loop, name="decision-report", daemon=True)
+        self.writer.start()
+        return self
+
+    def record(self, name, decision, comment=None):
+        """Log a decision on name ('undone' when one is taken back)"""
+        event = {'file': name, 'decision': decision, 'time': self.now(), 'reviewer': self.reviewer}
+        if comment is not None:
+            event['comment'] = comment
+        self._apply(event)
+        self.events.put(event)
+
+    def comment(self, name, text):
+        """Attach a comment to name, decided or not"""
+        event = {'file': name, 'time': self.now(), 'reviewer': self.reviewer, 'comment': text}
+        self._apply(event)
+        self.events.put(event)
+
+    def comment_of(self, name):
+        row = self.rows.get(name)
+        return row['comment'] if row else None
+
+    @staticmethod
+    def now():
+        return datetime.now(timezone.utc).astimezone().isoformat(timespec='seconds')
+
+    def _apply(self, event):
+        # Rows are replaced, never changed, so a snapshot can be written on another thread
+        row = self.rows.get(event['file'])
+        row = dict(row) if row else dict.fromkeys(self.FIELDS, None)
+        row['file'] = event['file']
+        self.rows[event['file']] = row
+        if 'decision' in event:
+            row['decision'] = None if event['decision'] == 'undone' else event['decision']
+        if 'comment' in event:
+            row['comment'] = event['comment']
+        row['time'] = event['time']
+        row['reviewer'] = event['reviewer']
+
+    def _write_loop(self):
+        while True:
+            batch = [self.events.get()]
+            # Everything that queued up while the last batch was written goes out together
+            while batch[-1] is not None:
+                try:
+                    batch.append(self.events.get_nowait())
+                except queue.Empty:
+                    break
+            lines = [json.dumps(event, ensure_ascii=False, separators=(',', ':')) + "\n"
+                     for event in batch if event is not None]
+            try:
+                self.file.writelines(lines)
+                self.file.flush()
+            except (OSError, ValueError):
+                # The audit trail is best effort - never stop the review over it
+                pass
+            for _ in batch:
+                self.events.task_done()
+            if batch[-1] is None:
+                return
+
+    def flush(self):
+        """Wait until everything recorded so far is in the file"""
+        if self.writer:
+            self.events.join()
+
+    def snapshot(self):
+        """The latest row of every decided or commented file"""
+        return [row for row in self.rows.values() if row['decision'] or row['comment']]
+
+    def export(self, path, rows=None):
+        """Write rows (default: a fresh snapshot) to path as CSV (.csv) or JSON Lines.
+
+        Safe to run on another thread with a snapshot taken beforehand; returns
+        the number of rows written.
+        """
+        partial_path = path + PARTIAL_SUFFIX
+        with open(partial_path, 'w', newline='', encoding='utf-8') as f:
+            count = self.write_rows(f, path.lower().endswith('.csv'), rows)
+        os.replace(partial_path, path)
+        return count
+
+    def write_rows(self, f, as_csv=True, rows=None):
+        """Write rows (default: a fresh snapshot) to an open file"""
+        if rows is None:
+            rows = self.snapshot()
+        if as_csv:
+            writer = csv.DictWriter(f, fieldnames=self.FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+        else:
+            f.writelines(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+        return len(rows)
+
+    def close(self):
+        if self.writer:
+            self.events.put(None)
+            self.writer.join()
+            self.writer = None
+        if self.file:
+            self.file.close()
+            self.file = None
+
+
+# Suffix of the temporary file a cross-device move copies into
+PARTIAL_SUFFIX = '.approveit-part'
+
+
+def move_file(source_path, destination_path, same_device=None):
+    """Move a file so that it only ever appears complete at the destination.
+
+    Same-device moves are a rename. Across devices the data is copied to a
+    temporary name next to the destination, renamed into place and only then
+    is the source removed. same_device=False, when the caller already knows,
+    goes straight to the copy instead of trying a rename first.
+    """
+    if same_device is not False:
+        try:
+            os.rename(source_path, destination_path)
+            return
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+    partial_path = destination_path + PARTIAL_SUFFIX
+    shutil.copy2(source_path, partial_path)
+    os.replace(partial_path, destination_path)
+    os.unlink(source_path)
+
+
+def same_file_contents(path_a, path_b):
+    """Cheap check that a copy made by move_file finished (copy2 keeps size and mtime)"""
+    a, b = os.stat(path_a), os.stat(path_b)
+    return a.st_size == b.st_size and int(a.st_mtime) == int(b.st_mtime)
+
+
+def lock_file(f, wait=False):
+    """Lock an open file against other processes until it is closed.
+
+    Returns False when another process holds the lock and wait is False.
+    """
+    try:
+        if os.name == 'nt':
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if wait else msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if wait else fcntl.LOCK_NB))
+        return True
+    except OSError:
+        if wait:
+            raise
+        return False
+
+
+class FileMover:
+    """Run file moves on a background thread behind an append-only journal.
+
+    Every move is written to the journal before it starts and marked done
+    afterwards. Each process keeps its own journal in journal_dir, locked for
+    as long as the process runs. On start-up the worker first replays the
+    journals nobody holds the lock of, so a crash can't leave a file
+    half-moved. Moves that have not started yet can be cancelled; failures
+    are queued for the UI to report.
+    """
+
+    def __init__(self, journal_dir=None):
+        if journal_dir is None:
+            journal_dir = os.path.join(default_cache_dir(), 'moves')
+        os.makedirs(journal_dir, exist_ok=True)
+        self.journal_dir = journal_dir
+        journal = self.create_journal(journal_dir)
+        self.journal_path = journal.name
+        self.condition = threading.Condition()
+        self.jobs = OrderedDict()  # job id -> (source, destination, same_device), not started yet
+        self.active = None  # job id being moved right now
+        self.active_source = None
+        self.batch_sources = set()  # sources of running move_batch calls
+        self.finished = set()
+        self.errors = queue.Queue()  # (job id, source, destination, exception)
+        self.stopping = False
+        self.batches = 0  # move_batch calls in progress
+        self.journal = None
+        self.next_id = 1
+        self.recovered = []
+        self.thread = threading.Thread(target=self._run, args=(journal,), name="file-mover", daemon=True)
+        with self.condition:
+            self.thread.start()
+            # Hold submissions until the abandoned journals have been replayed
+            while self.journal is None:
+                self.condition.wait()
+
+    @staticmethod
+    def create_journal(journal_dir):
+        """Create and lock a journal file of our own in journal_dir"""
+        while True:
+            handle, path = tempfile.mkstemp(prefix='moves-', suffix='.journal', dir=journal_dir)
+            os.close(handle)
+            journal = open(path, 'w', encoding='utf-8')
+            lock_file(journal, wait=True)
+            try:
+                # Another process may have taken it for abandoned and deleted it before we locked it
+                if os.path.samestat(os.fstat(journal.fileno()), os.stat(path)):
+                    return journal
+            except OSError:
+                pass
+            journal.close()
+
+    def replay_abandoned(self):
+        """Finish the moves of every journal in journal_dir whose process is gone.
+
+        Returns the (source, destination) pairs moved; replayed journals are deleted.
+        """
+        recovered = []
+        for name in sorted(os.listdir(self.journal_dir)):
+            path = os.path.join(self.journal_dir, name)
+            if not name.endswith('.journal') or path == self.journal_path:
+                continue
+            try:
+                journal = open(path, 'r+', encoding='utf-8')
+            except OSError:
+                continue
+            with journal:
+                if not lock_file(journal):
+                    # Its process is still running
+                    continue
+                recovered += self.replay_journal(path)
+                journal.truncate(0)
+                if os.name != 'nt':
+                    # Still under the lock, so its owner can't be between creating and locking it
+                    os.unlink(path)
+            if os.name == 'nt':
+                # Fails if another process has it open, which is what we want
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+        return recovered
+
+    def _write(self, record, sync=False):
+        self.journal.write(json.dumps(record) + "\n")
+        self.journal.flush()
+        if sync:
+            os.fsync(self.journal.fileno())
+
+    def submit(self, source_path, destination_path, same_device=None):
+        """Queue a move and return its job id; same_device is passed on to move_file"""
+        with self.condition:
+            job_id = self.next_id
+            self.next_id += 1
+            self._write({'op': 'move', 'id': job_id, 'src': source_path, 'dst': destination_path})
+            self.jobs[job_id] = (source_path, destination_path, same_device)
+            self.condition.notify_all()
+        return job_id
+
+    def cancel(self, job_id):
+        """Drop a move that has not started yet; returns False if it is too late"""
+        with self.condition:
+            if job_id not in self.jobs:
+                return False
+            del self.jobs[job_id]
+            self._write({'op': 'cancel', 'id': job_id})
+            self.condition.notify_all()
+            return True
+
+    def wait(self, job_id):
+        """Block until a job has been moved, cancelled or has failed"""
+        with self.condition:
+            while job_id in self.jobs or self.active == job_id:
+                self.condition.wait()
+
+    def wait_all(self):
+        with self.condition:
+            while self.jobs or self.active is not None:
+                self.condition.wait()
+
+    def pending_count(self):
+        with self.condition:
+            return len(self.jobs) + (self.active is not None)
+
+    def is_moving(self, source_path):
+        """Whether a queued or running move still has to take source_path away"""
+        with self.condition:
+            return (any(job[0] == source_path for job in self.jobs.values())
+                    or self.active_source == source_path or source_path in self.batch_sources)
+
+    def drain_errors(self):
+        errors = []
+        while True:
+            try:
+                errors.append(self.errors.get_nowait())
+            except queue.Empty:
+                return errors
+
+    def close(self):
+        """Finish the queued moves and stop the worker"""
+        with self.condition:
+            self.stopping = True
+            self.condition.notify_all()
+        self.thread.join()
+
+    def _run(self, journal):
+        try:
+            self.recovered = self.replay_abandoned()
+        finally:
+            with self.condition:
+                self.journal = journal
+                self.condition.notify_all()
+        while True:
+            with self.condition:
+                while not self.jobs and not self.stopping:
+                    self.condition.wait()
+                if not self.jobs:
+                    break
+                job_id, (source_path, destination_path, same_device) = self.jobs.popitem(last=False)
+                self.active = job_id
+                self.active_source = source_path
+                # The intent has to be on disk before the file system changes
+                self.journal.flush()
+                os.fsync(self.journal.fileno())
+            start = time.perf_counter()
+            try:
+                move_file(source_path, destination_path, same_device)
+                error = None
+            except Exception as e:
+                error = e
+            PERF.add('move', start)
+            with self.condition:
+                self.active = None
+                self.active_source = None
+                if error is None:
+                    self._write({'op': 'done', 'id': job_id})
+                else:
+                    self._write({'op': 'failed', 'id': job_id})
+                    self.errors.put((job_id, source_path, destination_path, error))
+                self._compact()
+                self.condition.notify_all()
+        settled = self.journal.tell() == 0
+        self.journal.close()
+        if settled:
+            # Nothing left for anyone to replay
+            try:
+                os.unlink(self.journal_path)
+            except OSError:
+                pass
+
+    def _compact(self):
+        if not self.jobs and self.active is None and not self.batches:
+            # Nothing in flight - the journal can start over
+            self.journal.truncate(0)
+            self.journal.seek(0)
+
+    def move_batch(self, moves, workers=4, progress=None):
+        """Run many moves in one journaled pass, returning [(source, destination, exception)] failures.
+
+        Moves are grouped by source and destination folder. Groups on the same
+        device are plain renames done in order; cross-device groups are copied
+        by a thread pool. progress(done, total) is called from worker threads.
+        """
+        moves = list(moves)
+        with self.condition:
+            self.batches += 1
+            jobs = []
+            for source_path, destination_path in moves:
+                jobs.append((self.next_id, source_path, destination_path))
+                self.batch_sources.add(source_path)
+                self._write({'op': 'move', 'id': self.next_id, 'src': source_path, 'dst': destination_path})
+                self.next_id += 1
+            # One sync for the whole batch instead of one per file
+            self.journal.flush()
+            os.fsync(self.journal.fileno())
+        
+        failures = []
+        counter = [0]
+        
+        def finish(job_id, source_path, destination_path, error):
+            with self.condition:
+                if error is None:
+                    self._write({'op': 'done', 'id': job_id})
+                else:
+                    self._write({'op': 'failed', 'id': job_id})
+                    failures.append((source_path, destination_path, error))
+                counter[0] += 1
+                done = counter[0]
+            if progress:
+                progress(done, len(jobs))
+        
+        def run(job_id, source_path, destination_path, same_device=None):
+            try:
+                start = time.perf_counter()
+                move_file(source_path, destination_path, same_device)
+                PERF.add('move', start)
+                finish(job_id, source_path, destination_path, None)
+            except Exception as e:
+                finish(job_id, source_path, destination_path, e)
+        
+        groups = OrderedDict()
+        for job in jobs:
+            groups.setdefault((os.path.dirname(job[1]), os.path.dirname(job[2])), []).append(job)
+        
+        try:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch-move") as pool:
+                for (source_folder, destination_folder), group in groups.items():
+                    try:
+                        same_device = os.stat(source_folder).st_dev == os.stat(destination_folder).st_dev
+                    except OSError:
+                        same_device = False
+                    if same_device:
+                        # Renames are metadata-only, threads would just contend on the directory
+                        for job in group:
+                            run(*job)
+                    else:
+                        for job in group:
+                            pool.submit(run, *job, False)
+        finally:
+            with self.condition:
+                self.batches -= 1
+                self.batch_sources.difference_update(job[1] for job in jobs)
+                self._compact()
+                self.condition.notify_all()
+        return failures
+
+    @staticmethod
+    def replay_journal(journal_path):
+        """Finish the moves a previous run left incomplete; returns the (source, destination) pairs"""
+        incomplete = OrderedDict()
+        try:
+            with open(journal_path, encoding='utf-8') as journal:
+                for line in journal:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A torn last line from the crash itself
+                        continue
+                    if record.get('op') == 'move':
+                        incomplete[record['id']] = (record['src'], record['dst'])
+                    else:
+                        incomplete.pop(record.get('id'), None)
+        except OSError:
+            return []
+        
+        recovered = []
+        for source_path, destination_path in incomplete.values():
+            try:
+                partial_path = destination_path + PARTIAL_SUFFIX
+                if os.path.exists(partial_path):
+                    os.unlink(partial_path)
+                if not os.path.exists(source_path):
+                    # The move finished before the crash, only its record is missing
+                    continue
+                if os.path.exists(destination_path) and same_file_contents(source_path, destination_path):
+                    # Copied across devices, but the source was not removed yet
+                    os.unlink(source_path)
+                else:
+                    move_file(source_path, destination_path)
+                recovered.append((source_path, destination_path))
+            except OSError:
+                continue
+        return recovered
+
+
+class RoutingTable:
+    """The categories images are sorted into, each with its key and destination folder.
+
+    approved (→) and disapproved (←) always exist. More categories, or other
+    keys and folders for these two, come from .approveit-routes.json in the
+    reviewed folder, or else from the file APPROVEIT_ROUTES names:
+
+        {"retouch": {"key": "r"}, "client-pick": {"key": "c", "folder": "/mnt/picks"}}
+
+    Keys are Tk key names. A folder defaults to the category name; relative
+    folders are inside the reviewed folder. They are resolved and created once
+    when the folder is opened, so a decision stays a dict lookup and a rename.
+    """
+
+    FILE_NAME = '.approveit-routes.json'
+    DEFAULTS = {'disapproved': 'Left', 'approved': 'Right'}
+    # Keys the review window already uses for something else
+    RESERVED_KEYS = frozenset(('Up', 'Down', 'z', 'y', 'g', 'n', 'plus', 'minus', 'space', 'F12'))
+
+    def __init__(self, folder, table=None):
+        self.folder = folder
+        self.keys = OrderedDict()  # category -> Tk key name
+        self.folders = OrderedDict()  # category -> resolved destination folder
+        self.same_device = {}  # category -> True when moving there is a rename
+        options = OrderedDict((name, {'key': key}) for name, key in self.DEFAULTS.items())
+        for name, entry in (table or {}).items():
+            if not isinstance(entry, dict):
+                raise ValueError(f"Category {name!r}: expected an object with a key")
+            options.setdefault(name, {}).update(entry)
+        for name, entry in options.items():
+            key = entry.get('key')
+            if not name or os.sep in name or name.startswith('.'):
+                raise ValueError(f"Invalid category name {name!r}")
+            if not isinstance(key, str) or not key:
+                raise ValueError(f"Category {name!r} has no key")
+            if key in self.RESERVED_KEYS or key in self.keys.values():
+                raise ValueError(f"Key {key!r} of category {name!r} is already in use")
+            self.keys[name] = key
+            folder_path = os.path.join(folder, os.path.expanduser(entry.get('folder') or name))
+            self.folders[name] = os.path.realpath(folder_path)
+        # A burst binding can't take over a key bound to something else either
+        taken = {f'<Key-{key}>' for key in self.RESERVED_KEYS.union(self.keys.values())}
+        for name, key in self.keys.items():
+            sequence = self.burst_key(key)
+            if sequence in taken:
+                raise ValueError(f"Burst key {sequence} of category {name!r} is already in use")
+            taken.add(sequence)
+
+    @classmethod
+    def load(cls, folder):
+        """The folder's routing table; raises ValueError for an invalid file"""
+        for path in (os.path.join(folder, cls.FILE_NAME), os.environ.get('APPROVEIT_ROUTES')):
+            if path and os.path.isfile(path):
+                with open(path, encoding='utf-8') as f:
+                    table = json.load(f)
+                if not isinstance(table, dict):
+                    raise ValueError(f"{path}: expected an object mapping categories to keys and folders")
+                return cls(folder, table)
+        return cls(folder)
+
+    def create_folders(self):
+        """Create every destination and note which of them moves can simply rename into"""
+        source_device = os.stat(self.folder).st_dev
+        for name, folder_path in self.folders.items():
+            os.makedirs(folder_path, exist_ok=True)
+            self.same_device[name] = os.stat(folder_path).st_dev == source_device
+
+    def renames_into(self, folder_path):
+        """Whether moving between the reviewed folder and folder_path is a rename (None: not known)"""
+        for name, path in self.folders.items():
+            if path == folder_path:
+                return self.same_device.get(name)
+        return None
+
+    @staticmethod
+    def burst_key(key):
+        """Key (Tk event pattern) deciding a whole burst: Shift with the category's key"""
+        if len(key) > 1:
+            return f'<Shift-Key-{key}>'
+        return f'<Key-{key.upper()}>' if key.islower() else None
+
+
+# Spellings accepted in decision files, mapped to the folder they send a file to
+DECISION_ALIASES = {
+    'approve': 'approved', 'approved': 'approved', 'accept': 'approved', 'yes': 'approved',
+    'disapprove': 'disapproved', 'disapproved': 'disapproved', 'reject': 'disapproved',
+    'rejected': 'disapproved', 'no': 'disapproved',
+}
+
+
+def read_decision_file(path, categories=()):
+    """Read (file name, category) pairs from a CSV, JSON or JSON Lines file.
+
+    CSV needs a header with a file/filename/name column and a decision/action
+    column. JSON can be a {"file": "decision"} mapping or a list of objects
+    with the same keys as the CSV columns; JSON Lines holds one object per line.
+    Decisions are one of DECISION_ALIASES or a name from categories.
+    """
+    def pick(row, keys):
+        for key in keys:
+            if row.get(key):
+                return str(row[key]).strip()
+        raise ValueError(f"Decision entry without {keys[0]!r}: {row!r}")
+
+    def from_rows(rows):
+        return [(pick(row, ('file', 'filename', 'name')), pick(row, ('decision', 'action')))
+                for row in rows]
+
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, newline='', encoding='utf-8') as f:
+        if extension == '.csv':
+            entries = from_rows(csv.DictReader(f))
+        elif extension == '.jsonl':
+            entries = from_rows(json.loads(line) for line in f if line.strip())
+        else:
+            data = json.load(f)
+            if isinstance(data, dict):
+                entries = [(str(name), str(decision)) for name, decision in data.items()]
+            else:
+                entries = from_rows(data)
+
+    decisions = []
+    for name, decision in entries:
+        folder = DECISION_ALIASES.get(decision.lower(), decision if decision in categories else None)
+        if folder is None:
+            raise ValueError(f"Unknown decision {decision!r} for {name}")
+        decisions.append((os.path.basename(name), folder))
+    return decisions
+
+
+class ApprovalEngine:
+    """A review session without any UI: folder, review queue, moves and undo history.
+
+    The Tk window drives it one decision at a time; the command line uses the
+    same engine to scan folders, build the preview cache and apply decision
+    files on machines without a display.
+    """
+
+    def __init__(self, mover=None, preview_cache=None, max_pixels=None):
+        self.original_folder = ""
+        self.approved_folder = ""
+        self.disapproved_folder = ""
+        self.routes = None
+        self.image_files = ReviewQueue()
+        self.undo_log = UndoLog()
+        self._mover = mover
+        self.preview_cache = preview_cache
+        self.loader = ImageLoader(preview_cache, max_pixels=max_pixels)
+        self.scanner = None
+        self.indexer = None
+        self.watcher = None
+        self.bursts = {}  # name -> near-duplicate group (list of names)
+        self.prescreen = None  # None, 'defer' or 'reject'
+        self.screen = QualityScreen()
+        self.flagged = {}  # name -> why the pre-screen thinks it is a reject
+        self.auto_rejected = []
+        self.session = None
+        self.view = None  # what the UI showed when the session was last saved
+        self.report = None
+        
+        # Decisions-only mode: decisions are tagged here and moved in one commit
+        self.defer_moves = False
+        self.pending_decisions = OrderedDict()  # file name -> destination folder
+
+    @property
+    def mover(self):
+        """The FileMover, started on first use so read-only commands never touch a journal"""
+        if self._mover is None:
+            self._mover = FileMover()
+        return self._mover
+
+    @staticmethod
+    def open_preview_cache():
+        """The shared preview cache, sized by APPROVEIT_PREVIEW_CACHE_MB (0 disables it)"""
+        try:
+            cache_mb = int(os.environ.get('APPROVEIT_PREVIEW_CACHE_MB', '1024'))
+            return PreviewCache(max_bytes=cache_mb * 1024 * 1024) if cache_mb > 0 else None
+        except (OSError, ValueError, sqlite3.Error):
+            return None
+
+    def open_folder(self, folder, create_folders=True, routes=None):
+        """Start a session on folder; the queue fills through start_scan or scan.
+
+        Loads the folder's routing table unless routes is given; raises
+        ValueError when its routing file is invalid.
+        """
+        routes = routes or RoutingTable.load(folder)
+        self.stop_scan()
+        self.close_session()
+        self.close_report()
+        self.original_folder = folder
+        self.routes = routes
+        self.approved_folder = routes.folders['approved']
+        self.disapproved_folder = routes.folders['disapproved']
+        if create_folders:
+            routes.create_folders()
+        self.image_files = ReviewQueue()
+        self.bursts = {}
+        self.flagged = {}
+        self.auto_rejected = []
+
+    def path_of(self, name):
+        return os.path.join(self.original_folder, name)
+
+    def start_session(self):
+        """Resume the folder's saved session, or start recording a new one.
+
+        Returns True when a session was restored: the queue, undo/redo history
+        and tagged decisions are back and self.view holds the saved view. A
+        later scan only adds files the session has never seen.
+        """
+        self.close_session()
+        session = SessionLog(self.original_folder)
+        self.view = None
+        try:
+            state = session.load()
+        except (KeyError, IndexError, TypeError, AttributeError, ValueError):
+            # Unreadable - start over rather than refuse to open the folder
+            state = None
+        self.undo_log = UndoLog()
+        if state:
+            self.image_files, self.undo_log, self.auto_rejected, self.view = state
+            self.pending_decisions = OrderedDict(
+                (record.file, record.destination) for record in self.undo_log if record.deferred)
+        try:
+            if state is None or session.events:
+                session.compact(self.image_files, self.undo_log, self.auto_rejected, self.view)
+            session.open()
+        except OSError:
+            # Read-only folder - review without a session file
+            return state is not None
+        self.session = session
+        self.image_files.journal = self.undo_log.journal = session.write
+        return state is not None
+
+    def save_view(self, index, zoom):
+        """Remember what the UI shows; the session log only gets a line when it changed"""
+        view = {'index': index, 'zoom': zoom}
+        if view == self.view:
+            return
+        self.view = view
+        if self.session:
+            self.session.write({'op': 'view', 'view': view})
+
+    def close_session(self):
+        """Write the session as one compact snapshot and stop recording"""
+        if not self.session:
+            return
+        self.image_files.journal = self.undo_log.journal = None
+        try:
+            self.session.compact(self.image_files, self.undo_log, self.auto_rejected, self.view)
+        except OSError:
+            pass
+        self.session.close()
+        self.session = None
+
+    def open_report(self, reviewer=None):
+        """Start appending decisions to the folder's report; returns it, or None if it can't be written"""
+        self.close_report()
+        report = DecisionReport(self.original_folder, reviewer)
+        try:
+            self.report = report.load().open()
+        except OSError:
+            self.report = None
+        return self.report
+
+    def close_report(self):
+        if self.report:
+            self.report.close()
+            self.report = None
+
+    def start_scan(self, watch=False):
+        """Scan the folder in the background, optionally watching it for later changes"""
+        self.stop_scan()
+        if watch:
+            # Watch before listing so nothing added during the scan is missed
+            self.watcher = FolderWatcher(self.original_folder).start()
+        self.scanner = FolderScanner(self.original_folder).start()
+        return self.scanner
+
+    def stop_scan(self):
+        if self.scanner:
+            self.scanner.stop()
+        if self.indexer:
+            self.indexer.stop()
+        if self.watcher:
+            self.watcher.stop()
+            self.watcher = None
+
+    def drain_watch(self):
+        """Apply files added or deleted by others; returns the (added, removed) names.
+
+        Events are checked against the disk and the moves in flight, so the
+        echo of our own moves never changes the queue.
+        """
+        added, removed = [], []
+        # Events from during the scan wait until the listing is complete
+        if not self.watcher or self.scanning():
+            return added, removed
+        for kind, name in self.watcher.drain():
+            path = self.path_of(name)
+            if kind == 'added':
+                if (name in self.image_files or name in self.pending_decisions or self.mover.is_moving(path)
+                        or not os.path.isfile(path) or not is_image_path(path)):
+                    continue
+                self.image_files.append(name)
+                added.append(name)
+            elif not os.path.exists(path):
+                if self.image_files.discard(name) is not None:
+                    removed.append(name)
+        return added, removed
+
+    def start_index(self, workers=None):
+        """Validate and index everything queued so far on a process pool"""
+        if self.indexer:
+            self.indexer.stop()
+        self.indexer = FolderIndexer(self.original_folder, self.image_files, workers).start()
+        return self.indexer
+
+    def indexing(self):
+        return bool(self.indexer and not self.indexer.finished)
+
+    def drain_index(self, keep=None):
+        """Apply fresh index results; returns the names dropped as invalid or moved by the pre-screen.
+
+        keep names an image (the one on screen) the pre-screen leaves alone.
+        """
+        changed = []
+        flagged = []
+        for name, entry in self.indexer.drain() if self.indexer else []:
+            if entry[2] is None:
+                if self.image_files.discard(name) is not None:
+                    changed.append(name)
+                continue
+            reason = self.screen.verdict(entry[7])
+            if reason:
+                self.flagged[name] = reason
+                flagged.append(name)
+        if self.indexer and self.indexer.finished:
+            self.bursts = self.indexer.bursts
+        changed.extend(self.apply_prescreen(flagged, keep))
+        return changed
+
+    def apply_prescreen(self, names=None, keep=None):
+        """Deal with flagged images according to self.prescreen; returns the names handled.
+
+        'defer' puts them behind everything else in the queue, 'reject' moves
+        them into the disapproved folder without an undo record.
+        """
+        if self.prescreen not in ('defer', 'reject'):
+            return []
+        handled = []
+        for name in self.flagged if names is None else names:
+            if name == keep or name not in self.image_files:
+                continue
+            if self.prescreen == 'defer':
+                self.image_files.move_to_end(name)
+            else:
+                self.image_files.discard(name)
+                self.mover.submit(self.path_of(name), os.path.join(self.disapproved_folder, name),
+                                  self.routes.renames_into(self.disapproved_folder))
+                self.auto_rejected.append(name)
+                if self.session:
+                    self.session.write({'op': 'auto_reject', 'name': name})
+                if self.report:
+                    self.report.record(name, 'disapproved', comment=f"pre-screen: {self.flagged.get(name)}")
+            handled.append(name)
+        return handled
+
+    def scanning(self):
+        return bool(self.scanner and not self.scanner.finished)
+
+    def drain_scan(self):
+        """Queue the names the scanner found since the last call and return them"""
+        names = self.scanner.drain() if self.scanner else []
+        # A resumed session already knows most of the folder
+        names = [name for name in names if name not in self.image_files.slots]
+        self.image_files.extend(names)
+        return names
+
+    def scan(self):
+        """Scan the whole folder synchronously and return the names queued"""
+        scanner = self.start_scan()
+        scanner.thread.join()
+        return self.drain_scan()
+
+    def decide(self, position, destination_folder, action, redo=False, group=None):
+        """Move the image at a queue position (or only tag it when deferring) and log it"""
+        name = self.image_files[position]
+        if self.defer_moves:
+            # Only tag the decision - the file is moved by a commit
+            job = None
+            self.pending_decisions[name] = destination_folder
+        else:
+            # Queue the move - callers move on while it runs in the background
+            # Cross-device categories go straight to the copy
+            job = self.mover.submit(self.path_of(name), os.path.join(destination_folder, name),
+                                    self.routes.renames_into(destination_folder))
+        
+        # Remove from the queue, remembering its slot for undo
+        slot = self.image_files.remove_at(position)
+        record = UndoRecord(name, self.original_folder, destination_folder, action, slot, job, self.defer_moves, group)
+        self.undo_log.record(record, keep_redo=redo)
+        if self.report:
+            self.report.record(name, action)
+        return record
+
+    def decide_group(self, slots, destination_folder, action):
+        """Decide the queued images in slots as one undo step; returns their records"""
+        slots = [slot for slot in slots if self.image_files.is_queued(slot)]
+        # The first slot is unique to this call and names the group
+        group = slots[0] if slots else None
+        return [self.decide(self.image_files.position_of(slot), destination_folder, action, group=group)
+                for slot in slots]
+
+    def decide_burst(self, position, destination_folder, action):
+        """Decide the image at position and every queued near-duplicate of it as one undo step"""
+        name = self.image_files[position]
+        slots = [self.image_files.slot_at(position)]
+        slots += [self.image_files.slots[other] for other in self.bursts.get(name, ())
+                  if other != name and other in self.image_files]
+        return self.decide_group(slots, destination_folder, action)
+
+    def burst_of(self, name):
+        """Queued near-duplicates of name, including itself (empty when it has none)"""
+        return [other for other in self.bursts.get(name, ()) if other in self.image_files]
+
+    def undo(self):
+        """Reverse the last decision and return its record, or None if there is nothing to undo.
+
+        The file is back in the queue at record.position (its slot). Raises
+        OSError if the file could not be moved back.
+        """
+        record = self.undo_log.pop_undo()
+        if record is None:
+            return None
+        self._undo(record)
+        # A burst or grid selection decision is undone as a whole
+        while record.group is not None:
+            member = self.undo_log.pop_undo(record.group)
+            if member is None:
+                break
+            self._undo(member)
+            record = member
+        return record
+
+    def _undo(self, record):
+        # Move file back, unless the move never got out of the queue
+        source_path = os.path.join(record.destination, record.file)
+        destination_path = os.path.join(record.source, record.file)
+        if record.deferred:
+            # Nothing touched the disk yet
+            self.pending_decisions.pop(record.file, None)
+        elif record.job is None or not self.mover.cancel(record.job):
+            if record.job is not None:
+                self.mover.wait(record.job)
+            if os.path.exists(source_path) or not os.path.exists(destination_path):
+                self.mover.wait(self.mover.submit(source_path, destination_path,
+                                                  self.routes.renames_into(record.destination)))
+                if not os.path.exists(destination_path):
+                    raise OSError(f"{record.file} could not be moved back")
+        
+        self.image_files.restore(record.position)
+        record.job = None
+        record.deferred = False
+        self.undo_log.push_redo(record)
+        if self.report:
+            self.report.record(record.file, 'undone')
+
+    def redo(self):
+        """Apply the most recently undone decision again; returns its queue position or None"""
+        record = self.undo_log.pop_redo()
+        if record is None:
+            return None
+        # A burst or grid selection comes back as a whole
+        records = [record]
+        while record.group is not None:
+            member = self.undo_log.pop_redo(record.group)
+            if member is None:
+                break
+            records.append(member)
+        # Undo put the files back in their old slots, unless the watcher or indexer took them out since
+        records = [record for record in records if self.image_files.is_queued(record.position)]
+        if not records:
+            return None
+        for record in records:
+            self.decide(self.image_files.position_of(record.position), record.destination, record.action,
+                        redo=True, group=record.group)
+        # Removing the rest of a burst can shift what takes the first image's place
+        return self.image_files.position_of(records[0].position)
+
+    def take_pending_moves(self):
+        """Hand over the tagged decisions as (source, destination) moves"""
+        moves = [(self.path_of(name), os.path.join(folder, name))
+                 for name, folder in self.pending_decisions.items()]
+        self.pending_decisions = OrderedDict()
+        # From here on undo has to move these files back like any other move
+        self.undo_log.settle_deferred()
+        return moves
+
+    def drop_pending(self):
+        """Forget tagged decisions without moving anything; their images are queued again"""
+        self.pending_decisions = OrderedDict()
+        for record in self.undo_log:
+            if record.deferred:
+                self.image_files.restore(record.position)
+                if self.report:
+                    self.report.record(record.file, 'undone', comment="not committed")
+        self.undo_log.drop_deferred()
+
+    def commit(self, progress=None, workers=4):
+        """Move every tagged file in one bulk pass; returns the failures"""
+        failures = self.mover.move_batch(self.take_pending_moves(), workers, progress)
+        for source_path, destination_path, error in failures:
+            self.recover_failed_move(source_path, destination_path=destination_path)
+        return failures
+
+    def recover_failed_move(self, source_path, job=None, destination_path=None):
+        """Drop the decision behind a failed move and queue the file again if it is still there"""
+        for record in list(self.undo_log):
+            if (job is not None and record.job == job) or \
+                    (destination_path and os.path.join(record.destination, record.file) == destination_path):
+                self.undo_log.remove(record)
+        if os.path.dirname(source_path) == self.original_folder and os.path.exists(source_path):
+            name = os.path.basename(source_path)
+            if name in self.auto_rejected:
+                self.auto_rejected.remove(name)
+                if self.session:
+                    self.session.write({'op': 'unreject', 'name': name})
+            if self.report:
+                self.report.record(name, 'undone', comment="move failed")
+            self.image_files.append(name)
+            return True
+        return False
+
+    def progress(self):
+        """(remaining, processed) counts, both O(1)"""
+        return len(self.image_files), len(self.undo_log) + len(self.auto_rejected)
+
+    def apply_decision_file(self, path, workers=4, progress=None):
+        """Apply a CSV/JSON decision file to the open folder in one batch.
+
+        Returns (moved count, failures, names not found in the folder).
+        """
+        folders = self.routes.folders
+        moves = []
+        decisions = []
+        missing = []
+        for name, decision in read_decision_file(path, folders):
+            source_path = self.path_of(name)
+            if not os.path.isfile(source_path):
+                missing.append(name)
+                continue
+            moves.append((source_path, os.path.join(folders[decision], name)))
+            decisions.append(decision)
+        failures = self.mover.move_batch(moves, workers, progress)
+        if self.report:
+            failed = {source_path for source_path, _, _ in failures}
+            for (source_path, _), decision in zip(moves, decisions):
+                if source_path not in failed:
+                    self.report.record(os.path.basename(source_path), decision)
+        return len(moves) - len(failures), failures, missing
+
+    def build_preview_cache(self, workers=None, progress=None):
+        """Decode previews for every image of the open folder not cached yet, across processes.
+
+        Returns the number of previews added.
+        """
+        if self.preview_cache is None:
+            return 0
+        cache = self.preview_cache
+        loader = self.loader
+        paths = []
+        index = FolderIndex(self.original_folder)
+        for name in self.scan():
+            if not index.is_image(name):
+                continue
+            path = self.path_of(name)
+            try:
+                if not cache.contains(cache.make_key(path, os.stat(path), loader.preview_key)):
+                    paths.append(path)
+            except OSError:
+                continue
+        
+        added = 0
+        with process_pool(workers) as pool:
+            results = pool.map(render_preview, paths, [loader.preview_edge] * len(paths),
+                               [loader.preview_zoom] * len(paths), chunksize=8)
+            for done, result in enumerate(results, 1):
+                if result is not None:
+                    path, stat, data, width, height = result
+                    cache.store(cache.make_key(path, stat, loader.preview_key), data, width, height)
+                    added += 1
+                if progress:
+                    progress(done, len(paths))
+        return added
+
+    def close(self):
+        self.stop_scan()
+        self.close_session()
+        self.close_report()
+        # Let queued moves finish so nothing is left for the journal to replay
+        if self._mover:
+            self._mover.close()
+        if self.preview_cache:
+            self.preview_cache.close()
+
 
 class ImageApprover:
+    RENDER_KINDS = ('layout', 'zoom', 'image')  # weakest to strongest
+
     def __init__(self, root):
         self.root = root
         self.root.title("ApproveIT v2.0")
@@ -26,38 +2906,111 @@ class ImageApprover:
         self.style = ttk.Style()
         self.theme = 'dark'  # Default theme
 
-        # Initialize variables
-        self.image_files = []
+        # Session state and file operations live in the UI-independent engine
+        self.engine = ApprovalEngine(
+            preview_cache=ApprovalEngine.open_preview_cache(), max_pixels=12_000_000
+        )
         self.current_index = 0
-        self.approved_folder = ""
-        self.disapproved_folder = ""
-        self.original_folder = ""
         
         # Zoom variables
-        self.zoom_factor = 0.4  # Start with 40% zoom
+        self.zoom_factor = DEFAULT_ZOOM  # Start with 40% zoom
         self.zoom_step = 0.1
         self.min_zoom = 0.1
         self.max_zoom = 5.0
         
-        # Undo stack (max 10 operations)
-        self.undo_stack = deque(maxlen=10)
+        # Background decoder for the images around the current one
+        self.prefetcher = ImagePrefetcher(self.engine.loader)
+        
+        # Moves run in the background - report the ones that fail
+        self.root.after(200, self.poll_moves)
+        
+        # Bulk commit of the decisions-only mode runs on its own thread
+        self.commit_thread = None
+        self.commit_progress = queue.Queue()
+        
+        # Resolution pyramid of the current image, used for zoom steps
+        self.pyramid = None
+        self.pyramid_future = None
+        self.pyramid_target = None  # (image path, zoom) the pending build covers
+        self.pyramid_poll_job = None
+        self.pyramid_upscaled = False  # the canvas shows an upscale while a build runs
+        self.pyramid_poll_interval = 30  # ms
+        self.pyramid_headroom = 2.0  # build levels for twice the current zoom
+        # Its own thread, so a build never holds up the prefetched neighbours
+        self.pyramid_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pyramid")
+        self.zoom_refine_job = None
+        self.zoom_refine_delay = 150  # ms of idle input before the LANCZOS re-render
+        self.perf_overlay = False
+        
+        # Render scheduler: at most one render per frame, whatever asked for it
+        self.frame_interval = 16  # ms
+        self.render_job = None
+        self.render_pending = None
+        self.canvas_dims = None
+        
+        # Viewport: zoomed images bigger than max_bitmap_pixels are drawn as tiles
+        self.max_bitmap_pixels = 12_000_000
+        self.tile_size = 256
+        self.tile_cache = LRUCache(96)
+        self.tile_photos = []
+        self.tile_items = []
+        self.photo = None
+        self.photo_pool = PhotoPool()
+        self.image_item = None
+        self.view_mode = None
+        self.view_size = None
+        self.view_x = 0
+        self.view_y = 0
+        self.shown_path = None
+        self.rendered_zoom = None
+        self.pan_anchor = None
+        
+        # Contact-sheet grid: only the cells on screen get canvas items and PhotoImages
+        self.grid_mode = False
+        self.grid_cell = 168  # px per cell: thumbnail, caption and padding
+        self.grid_scroll = 0
+        self.grid_follow = False  # scroll the current cell into view on the next draw
+        self.grid_selection = set()  # queue slots, so selections survive earlier decisions
+        self.grid_anchor = None
+        self.grid_photos = LRUCache(256)
+        self.grid_poll_job = None
+        self.thumbnails = ThumbnailCache(self.engine.loader, edge=self.grid_cell - 24)
         
         # Create UI
         self.create_widgets()
         
         # Bind keyboard events
-        self.root.bind('<Left>', lambda event: self.disapprove_image())
-        self.root.bind('<Right>', lambda event: self.approve_image())
+        # One key per category (← and → until a folder brings its own routing table)
+        self.route_bindings = []
+        self.bind_routes()
         self.root.bind('<Up>', lambda event: self.previous_image())
         self.root.bind('<Down>', lambda event: self.next_image())
         self.root.bind('<z>', lambda event: self.undo_last_action())
+        self.root.bind('<y>', lambda event: self.redo_last_action())
+        self.root.bind('<g>', lambda event: self.toggle_grid())
+        self.root.bind('<n>', lambda event: self.comment_current())
+        self.root.bind('<Control-e>', lambda event: self.export_report())
         self.root.bind('<plus>', lambda event: self.zoom_in())
         self.root.bind('<minus>', lambda event: self.zoom_out())
         self.root.bind('<space>', lambda event: self.reset_zoom())
         self.root.bind('<KeyRelease-space>', lambda event: self.reset_zoom())
+        self.root.bind('<F12>', lambda event: self.toggle_perf_overlay())
+        self.root.bind('<Shift-F12>', lambda event: self.export_trace())
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
         self.apply_theme()
 
+    def on_close(self):
+        """Stop background workers before the window goes away"""
+        if not self.resolve_pending_decisions():
+            return
+        self.engine.save_view(self.current_index, self.zoom_factor)
+        self.prefetcher.shutdown()
+        self.thumbnails.shutdown()
+        self.pyramid_executor.shutdown(wait=False)
+        self.engine.close()
+        self.root.destroy()
+
     def apply_theme(self):
         font_family = "Segoe UI" if os.name == 'nt' else "SF Pro" if os.name == 'posix' else "Arial"
 
@@ -154,6 +3107,7 @@ class ImageApprover:
         
         # Initialize toggle state
         self.toggle_state = self.theme == 'dark'
+        self.toggle_animation = None
         
         # Draw initial toggle
         self.draw_toggle()
@@ -161,58 +3115,60 @@ class ImageApprover:
         # Bind click event
         self.toggle_canvas.bind("<Button-1>", self.on_toggle_click)
         
+    def toggle_colors(self):
+        """(background, track on, track off, thumb, shadow, icon) colors of the current theme"""
+        if self.theme == 'dark':
+            # Darker teal for better contrast, gold for the moon
+            return "#2d2d2d", "#1a5f5a", "#3a3a3a", "#f8f9fa", "#1a1a1a", "#ffd700"
+        # Brighter teal for light theme, amber for the sun
+        return "#f0f0f0", "#20b2aa", "#d1d5db", "#ffffff", "#9ca3af", "#f59e0b"
+        
     def draw_toggle(self):
-        """Draw the toggle switch on canvas with moon/sun icons"""
+        """Build the toggle switch items once; later changes only restyle and move them"""
         self.toggle_canvas.delete("all")
         
-        # Enhanced colors based on current theme and state
-        if self.theme == 'dark':
-            bg_color = "#2d2d2d"
-            track_on = "#1a5f5a"  # Darker teal for better contrast
-            track_off = "#3a3a3a"
-            thumb_color = "#f8f9fa"
-            thumb_shadow = "#1a1a1a"
-            icon_color = "#ffd700"  # Gold for moon
-        else:
-            bg_color = "#f0f0f0"
-            track_on = "#20b2aa"  # Brighter teal for light theme
-            track_off = "#d1d5db"
-            thumb_color = "#ffffff"
-            thumb_shadow = "#9ca3af"
-            icon_color = "#f59e0b"  # Amber for sun
-            
-        # Set canvas background
-        self.toggle_canvas.configure(bg=bg_color)
-        
         # Draw track shadow for depth
-        track_color = track_on if self.toggle_state else track_off
-        self.create_rounded_rect(
-            self.toggle_canvas, 6, 9, 56, 23, 7, fill=thumb_shadow, outline=""
+        self.track_shadow = self.create_rounded_rect(
+            self.toggle_canvas, 6, 9, 56, 23, 7, fill="", outline=""
         )
         
         # Draw main track
         self.track = self.create_rounded_rect(
-            self.toggle_canvas, 5, 8, 55, 22, 7, fill=track_color, outline=""
+            self.toggle_canvas, 5, 8, 55, 22, 7, fill="", outline=""
         )
         
-        # Draw thumb shadow for depth
-        thumb_x = 42 if self.toggle_state else 18
-        self.toggle_canvas.create_oval(
-            thumb_x-7, 7, thumb_x+9, 25, 
-            fill=thumb_shadow, outline=""
+        # Thumb, its shadow and its icon move together as the "knob"
+        self.thumb_x = 18
+        self.thumb_shadow = self.toggle_canvas.create_oval(
+            self.thumb_x-7, 7, self.thumb_x+9, 25, 
+            fill="", outline="", tags=("knob",)
         )
-        
-        # Draw main thumb
         self.thumb = self.toggle_canvas.create_oval(
-            thumb_x-8, 6, thumb_x+8, 24, 
-            fill=thumb_color, outline="#e5e7eb", width=1
+            self.thumb_x-8, 6, self.thumb_x+8, 24, 
+            fill="", outline="#e5e7eb", width=1, tags=("knob",)
         )
+        self.style_toggle()
         
-        # Draw moon/sun icon on the thumb
-        if self.toggle_state:  # Dark theme - show moon
-            self.draw_moon_icon(thumb_x, 15, icon_color)
-        else:  # Light theme - show sun
-            self.draw_sun_icon(thumb_x, 15, icon_color)
+    def style_toggle(self, thumb_x=None):
+        """Recolor the toggle for the current theme and state, with the thumb at thumb_x"""
+        bg_color, track_on, track_off, thumb_color, thumb_shadow, icon_color = self.toggle_colors()
+        self.toggle_canvas.configure(bg=bg_color)
+        self.toggle_canvas.itemconfig(self.track_shadow, fill=thumb_shadow)
+        self.toggle_canvas.itemconfig(self.track, fill=track_on if self.toggle_state else track_off)
+        self.toggle_canvas.itemconfig(self.thumb_shadow, fill=thumb_shadow)
+        self.toggle_canvas.itemconfig(self.thumb, fill=thumb_color)
+        self.move_thumb(thumb_x if thumb_x is not None else 42 if self.toggle_state else 18)
+        
+        # Only the icon is redrawn - moon for dark theme, sun for light
+        self.toggle_canvas.delete("icon")
+        if self.toggle_state:
+            self.draw_moon_icon(self.thumb_x, 15, icon_color)
+        else:
+            self.draw_sun_icon(self.thumb_x, 15, icon_color)
+            
+    def move_thumb(self, thumb_x):
+        self.toggle_canvas.move("knob", thumb_x - self.thumb_x, 0)
+        self.thumb_x = thumb_x
         
     def draw_moon_icon(self, center_x, center_y, color):
         """Draw an enhanced crescent moon icon"""
@@ -222,14 +3178,14 @@ class ImageApprover:
         self.toggle_canvas.create_oval(
             center_x - moon_radius, center_y - moon_radius,
             center_x + moon_radius, center_y + moon_radius,
-            fill=color, outline=""
+            fill=color, outline="", tags=("knob", "icon")
         )
         
         # Add moon highlight
         self.toggle_canvas.create_oval(
             center_x - moon_radius + 1, center_y - moon_radius + 1,
             center_x + moon_radius - 1, center_y + moon_radius - 1,
-            fill="#fff8dc", outline=""
+            fill="#fff8dc", outline="", tags=("knob", "icon")
         )
         
         # Create crescent by overlaying a smaller circle
@@ -239,7 +3195,7 @@ class ImageApprover:
         self.toggle_canvas.create_oval(
             overlay_x - overlay_radius, center_y - overlay_radius,
             overlay_x + overlay_radius, center_y + overlay_radius,
-            fill=overlay_color, outline=""
+            fill=overlay_color, outline="", tags=("knob", "icon")
         )
         
         # Add small stars around moon
@@ -247,7 +3203,7 @@ class ImageApprover:
         for sx, sy in star_positions:
             star_x, star_y = center_x + sx, center_y + sy
             self.toggle_canvas.create_text(
-                star_x, star_y, text="✦", fill="#ffd700", font=("Arial", 4)
+                star_x, star_y, text="✦", fill="#ffd700", font=("Arial", 4), tags=("knob", "icon")
             )
     
     def draw_sun_icon(self, center_x, center_y, color):
@@ -269,7 +3225,7 @@ class ImageApprover:
             y2 = center_y + (ray_distance + ray_length) * math.sin(angle)
             
             self.toggle_canvas.create_line(
-                x1, y1, x2, y2, fill=ray_color, width=2, capstyle="round"
+                x1, y1, x2, y2, fill=ray_color, width=2, capstyle="round", tags=("knob", "icon")
             )
         
         # Sun center circle with gradient effect
@@ -278,21 +3234,21 @@ class ImageApprover:
         self.toggle_canvas.create_oval(
             center_x - sun_radius, center_y - sun_radius,
             center_x + sun_radius, center_y + sun_radius,
-            fill=color, outline=""
+            fill=color, outline="", tags=("knob", "icon")
         )
         
         # Add sun highlight for 3D effect
         self.toggle_canvas.create_oval(
             center_x - sun_radius + 1, center_y - sun_radius + 1,
             center_x + sun_radius - 1, center_y + sun_radius - 1,
-            fill="#fef3c7", outline=""
+            fill="#fef3c7", outline="", tags=("knob", "icon")
         )
         
         # Add inner glow
         self.toggle_canvas.create_oval(
             center_x - 2, center_y - 2,
             center_x + 2, center_y + 2,
-            fill="#fffbeb", outline=""
+            fill="#fffbeb", outline="", tags=("knob", "icon")
         )
     
     def create_rounded_rect(self, canvas, x1, y1, x2, y2, radius, **kwargs):
@@ -308,79 +3264,49 @@ class ImageApprover:
     def on_toggle_click(self, event):
         """Handle toggle click event with animation"""
         self.toggle_state = not self.toggle_state
-        self.animate_toggle()
         self.toggle_theme()
+        self.animate_toggle()
         
     def animate_toggle(self):
         """Animate the toggle switch transition"""
-        # Get current and target positions
-        current_x = 18 if not self.toggle_state else 42
+        # Slide from the old side to the new one
+        current_x = 18 if self.toggle_state else 42
         target_x = 42 if self.toggle_state else 18
         
         # Animation parameters
         steps = 8
         step_size = (target_x - current_x) / steps
-        delay = 20  # milliseconds
         
-        # Animate the thumb movement
+        # A click during an animation restarts it
+        if self.toggle_animation:
+            self.toggle_canvas.after_cancel(self.toggle_animation)
+        self.style_toggle(current_x)
         self.animate_step(current_x, target_x, step_size, steps, 0)
         
     def animate_step(self, current_x, target_x, step_size, total_steps, current_step):
-        """Perform one step of the animation"""
+        """Perform one step of the animation by moving the existing items"""
         if current_step >= total_steps:
-            # Animation complete, draw final state
-            self.draw_toggle()
+            # Animation complete, settle on the final state
+            self.toggle_animation = None
+            self.style_toggle()
             return
             
-        # Calculate new position
-        new_x = current_x + (step_size * current_step)
-        
-        # Update track color during animation
-        if self.theme == 'dark':
-            track_on = "#2a9d8f"
-            track_off = "#404040"
-            thumb_color = "#ffffff"
-        else:
-            track_on = "#2a9d8f"
-            track_off = "#cccccc"
-            thumb_color = "#ffffff"
-            
         # Interpolate track color
         progress = current_step / total_steps
+        track_on, track_off = "#2a9d8f", "#404040" if self.theme == 'dark' else "#cccccc"
         if self.toggle_state:
-            # Transitioning to ON
-            track_color = self.interpolate_color(track_off, track_on, progress)
-        else:
-            # Transitioning to OFF
-            track_color = self.interpolate_color(track_on, track_off, progress)
-            
-        # Clear and redraw
-        self.toggle_canvas.delete("all")
-        
-        # Set canvas background
-        bg_color = "#2d2d2d" if self.theme == 'dark' else "#f0f0f0"
-        self.toggle_canvas.configure(bg=bg_color)
-        
-        # Draw track
-        self.create_rounded_rect(
-            self.toggle_canvas, 5, 8, 55, 22, 7, fill=track_color, outline=""
-        )
-        
-        # Draw thumb at current position
-        self.toggle_canvas.create_oval(
-            new_x-8, 6, new_x+8, 24, 
-            fill=thumb_color, outline="#dddddd", width=1
-        )
+            # Transitioning to ON
+            track_color = self.interpolate_color(track_off, track_on, progress)
+        else:
+            # Transitioning to OFF
+            track_color = self.interpolate_color(track_on, track_off, progress)
+        self.toggle_canvas.itemconfig(self.track, fill=track_color)
         
-        # Draw moon/sun icon on the moving thumb
-        icon_color = "#ffd700" if self.theme == 'dark' else "#f59e0b"
-        if self.toggle_state:  # Dark theme - show moon
-            self.draw_moon_icon(new_x, 15, icon_color)
-        else:  # Light theme - show sun
-            self.draw_sun_icon(new_x, 15, icon_color)
+        # Slide the thumb and its icon
+        self.move_thumb(current_x + step_size * current_step)
         
         # Schedule next step
-        self.toggle_canvas.after(20, lambda: self.animate_step(
+        self.toggle_animation = self.toggle_canvas.after(20, lambda: self.animate_step(
             current_x, target_x, step_size, total_steps, current_step + 1
         ))
         
@@ -401,7 +3327,8 @@ class ImageApprover:
     def update_canvas_toggle(self):
         """Update toggle appearance after theme change"""
         self.toggle_state = self.theme == 'dark'
-        self.draw_toggle()
+        if not self.toggle_animation:
+            self.style_toggle()
 
     def create_widgets(self):
         # Main frame
@@ -434,6 +3361,24 @@ class ImageApprover:
         self.canvas = tk.Canvas(self.image_frame, highlightthickness=0)
         self.canvas.pack(fill=tk.BOTH, expand=True)
         
+        # Keep the image placed right when the window is resized
+        self.canvas.bind('<Configure>', self.on_canvas_configure)
+        
+        # Pan zoomed images by dragging or scrolling
+        self.canvas.bind('<ButtonPress-1>', self.start_pan)
+        self.canvas.bind('<Double-Button-1>', self.open_grid_cell)
+        self.canvas.bind('<B1-Motion>', self.drag_pan)
+        self.canvas.bind('<MouseWheel>', self.scroll_pan)
+        self.canvas.bind('<Shift-MouseWheel>', lambda event: self.scroll_pan(event, horizontal=True))
+        self.canvas.bind('<Button-4>', self.scroll_pan)
+        self.canvas.bind('<Button-5>', self.scroll_pan)
+        self.canvas.bind('<Shift-Button-4>', lambda event: self.scroll_pan(event, horizontal=True))
+        self.canvas.bind('<Shift-Button-5>', lambda event: self.scroll_pan(event, horizontal=True))
+        
+        # Performance overlay, floating over the canvas while switched on (F12)
+        self.perf_label = tk.Label(self.canvas, justify=tk.LEFT, anchor=tk.NW, font=("Courier", 9),
+                                   bg="#000000", fg="#7CFC00", padx=6, pady=4)
+        
         # Zoom controls
         self.zoom_frame = ttk.Frame(self.main_frame, style="TFrame")
         self.zoom_frame.pack(pady=(0, 10))
@@ -472,123 +3417,628 @@ class ImageApprover:
         self.undo_btn = ttk.Button(self.control_frame, text="↩ Undo", command=self.undo_last_action, style="TButton", state=tk.DISABLED)
         self.undo_btn.pack(side=tk.LEFT)
         
+        self.redo_btn = ttk.Button(self.control_frame, text="↪ Redo", command=self.redo_last_action, style="TButton", state=tk.DISABLED)
+        self.redo_btn.pack(side=tk.LEFT, padx=(5, 0))
+        
+        # Decisions-only mode and its bulk commit
+        self.defer_var = tk.BooleanVar(value=False)
+        self.defer_check = ttk.Checkbutton(self.control_frame, text="⏸ Defer moves", variable=self.defer_var, command=self.toggle_defer_moves)
+        self.defer_check.pack(side=tk.LEFT, padx=(15, 0))
+        
+        self.commit_btn = ttk.Button(self.control_frame, text="⤓ Commit", command=self.commit_decisions, style="TButton", state=tk.DISABLED)
+        self.commit_btn.pack(side=tk.LEFT, padx=(5, 0))
+        
+        self.prescreen_var = tk.BooleanVar(value=False)
+        self.prescreen_check = ttk.Checkbutton(self.control_frame, text="🔍 Pre-screen", variable=self.prescreen_var, command=self.toggle_prescreen)
+        self.prescreen_check.pack(side=tk.LEFT, padx=(15, 0))
+        
+        self.grid_var = tk.BooleanVar(value=False)
+        self.grid_check = ttk.Checkbutton(self.control_frame, text="▦ Grid", variable=self.grid_var, command=self.toggle_grid)
+        self.grid_check.pack(side=tk.LEFT, padx=(15, 0))
+        
+        # Audit report: comments on the current image and the export
+        self.comment_btn = ttk.Button(self.control_frame, text="💬 Comment", command=self.comment_current, style="TButton")
+        self.comment_btn.pack(side=tk.LEFT, padx=(15, 0))
+        
+        self.report_btn = ttk.Button(self.control_frame, text="📄 Report", command=self.export_report, style="TButton")
+        self.report_btn.pack(side=tk.LEFT, padx=(5, 0))
+        
         # Spacer
         ttk.Frame(self.control_frame).pack(side=tk.LEFT, expand=True)
         
-        self.disapprove_btn = ttk.Button(self.control_frame, text="❌ Disapprove", command=self.disapprove_image, style="Disapprove.TButton", state=tk.DISABLED)
-        self.disapprove_btn.pack(side=tk.LEFT)
+        # Buttons for the folder's extra categories go here
+        self.route_frame = ttk.Frame(self.control_frame, style="TFrame")
+        self.route_frame.pack(side=tk.LEFT)
+        self.route_buttons = []
         
-        self.approve_btn = ttk.Button(self.control_frame, text="✔ Approve", command=self.approve_image, style="Approve.TButton", state=tk.DISABLED)
+        self.disapprove_btn = ttk.Button(self.control_frame, text="❌ Disapprove", command=lambda: self.decide_category('disapproved'), style="Disapprove.TButton", state=tk.DISABLED)
+        self.disapprove_btn.pack(side=tk.LEFT, padx=(5, 0))
+        
+        self.approve_btn = ttk.Button(self.control_frame, text="✔ Approve", command=lambda: self.decide_category('approved'), style="Approve.TButton", state=tk.DISABLED)
         self.approve_btn.pack(side=tk.LEFT, padx=(5, 0))
 
         # Bind hover events to all buttons
     def select_folder(self):
+        if not self.resolve_pending_decisions():
+            return
         folder_path = filedialog.askdirectory()
         if folder_path:
-            self.original_folder = folder_path
             self.folder_label.config(text=folder_path)
             
-            # Create approved and disapproved folders
-            self.approved_folder = os.path.join(folder_path, "approved")
-            self.disapproved_folder = os.path.join(folder_path, "disapproved")
-            
-            os.makedirs(self.approved_folder, exist_ok=True)
-            os.makedirs(self.disapproved_folder, exist_ok=True)
+            # Create the folders of every category
+            self.engine.save_view(self.current_index, self.zoom_factor)
+            try:
+                self.engine.open_folder(folder_path)
+            except (OSError, ValueError) as e:
+                messagebox.showerror("Error", f"Could not open folder: {str(e)}")
+                return
             
             # Load images
+            self.bind_routes()
             self.load_images()
             
     def load_images(self):
-        # Get all files in the folder
-        all_files = [f for f in os.listdir(self.original_folder) 
-                    if os.path.isfile(os.path.join(self.original_folder, f))]
-        
-        # Filter for image files using Pillow
-        self.image_files = []
-        for file in all_files:
-            file_path = os.path.join(self.original_folder, file)
-            try:
-                # Try to open the image with Pillow to verify it's a valid image
-                with Image.open(file_path) as img:
-                    # Exclude files already in approved/disapproved folders
-                    if "approved" not in file_path and "disapproved" not in file_path:
-                        self.image_files.append(file)
-            except Exception:
-                # Not a valid image file, skip it
-                continue
+        self.current_index = 0
+        self.prefetcher.clear()
+        self.photo_pool.clear()
+        self.thumbnails.clear()
+        self.grid_photos.clear()
+        self.grid_selection.clear()
+        self.grid_anchor = None
+        self.grid_scroll = 0
+        self.clear_canvas()
+        self.image_name_label.config(text="")
+        
+        # Pick up where the last session on this folder left off
+        self.engine.open_report()
+        if self.engine.start_session():
+            self.resume_session()
+            
+        # Scan in the background - images are only fully validated when displayed
+        self.poll_scan(self.engine.start_scan(watch=True))
+        
+    def resume_session(self):
+        """Show a restored session at the image and zoom it was left at"""
+        view = self.engine.view or {}
+        self.zoom_factor = view.get('zoom', self.zoom_factor)
+        self.current_index = min(view.get('index', 0), max(0, len(self.engine.image_files) - 1))
+        if self.engine.image_files:
+            self.display_image()
+            self.set_decision_buttons(True)
+        self.undo_btn.state(['!disabled'] if self.engine.undo_log else ['disabled'])
+        self.update_redo_button()
+        self.update_commit_button()
+        self.update_navigation_buttons()
+        self.update_progress()
         
-        if not self.image_files:
+    def poll_scan(self, scanner):
+        """Move freshly scanned names into the list and keep polling until done"""
+        if scanner is not self.engine.scanner:
+            return
+            
+        first_batch = not self.engine.image_files
+        if self.engine.drain_scan():
+            if first_batch:
+                # Don't reset zoom when loading new folder - keep the default 40%
+                self.display_image()
+                
+                # Enable buttons
+                self.set_decision_buttons(True)
+            else:
+                self.prefetch_neighbours()
+            self.update_navigation_buttons()
+            
+        self.update_progress()
+            
+        if not scanner.finished:
+            self.root.after(50, lambda: self.poll_scan(scanner))
+            return
+            
+        # Pick up files that arrive or vanish while reviewing
+        if self.engine.watcher:
+            self.poll_watch(self.engine.watcher)
+        if not self.engine.image_files:
             messagebox.showinfo("No Images", "No valid image files found in the selected folder.")
+        else:
+            # Validate and index everything in the background while reviewing
+            self.poll_index(self.engine.start_index())
+            
+    def poll_watch(self, watcher):
+        """Follow files other programs add to or delete from the folder"""
+        if watcher is not self.engine.watcher:
             return
             
-        self.current_index = 0
-        self.progress_bar['maximum'] = len(self.image_files)
-        self.progress_bar['value'] = 0
-        # Don't reset zoom when loading new folder - keep the default 40%
-        self.display_image()
-        
-        # Enable buttons
-        self.disapprove_btn.state(['!disabled'])
-        self.approve_btn.state(['!disabled'])
-        self.update_navigation_buttons()
+        was_empty = not self.engine.image_files
+        current_name = self.current_name()
+        added, removed = self.engine.drain_watch()
+        for name in removed:
+            self.prefetcher.discard(self.engine.path_of(name))
+        if removed:
+            self.keep_current(current_name)
+        if added:
+            if was_empty:
+                self.current_index = 0
+                self.display_image()
+                self.set_decision_buttons(True)
+            else:
+                self.prefetch_neighbours()
+            self.update_navigation_buttons()
+        if added or removed:
+            self.update_progress()
+            
+        self.root.after(500, lambda: self.poll_watch(watcher))
         
+    def current_name(self):
+        if self.current_index < len(self.engine.image_files):
+            return self.engine.image_files[self.current_index]
+        return None
+        
+    def keep_current(self, current_name):
+        """Point current_index back at current_name after entries before it went away"""
+        if current_name in self.engine.image_files:
+            self.current_index = self.engine.image_files.position_of(self.engine.image_files.slots[current_name])
+        else:
+            # The image on screen went away - show the one that slid into its place
+            self.current_index = min(self.current_index, max(0, len(self.engine.image_files) - 1))
+            if self.engine.image_files:
+                self.display_image()
+            else:
+                self.clear_canvas()
+                self.image_name_label.config(text="")
+        self.update_navigation_buttons()
+            
+    def poll_index(self, indexer):
+        """Drop files the indexer found invalid and show indexing progress"""
+        if indexer is not self.engine.indexer:
+            return
+            
+        current_name = self.current_name()
+        if self.engine.drain_index(keep=current_name):
+            self.keep_current(current_name)
+            
         self.update_progress()
+        if not indexer.finished:
+            self.root.after(100, lambda: self.poll_index(indexer))
+        elif self.engine.image_files:
+            # The near-duplicate groups arrived with the last results
+            self.update_name_label()
+            
+    def update_name_label(self):
+        name = self.current_name()
+        if name is None:
+            return
+        burst = self.engine.burst_of(name)
+        reason = self.engine.flagged.get(name)
+        if len(burst) > 1:
+            name += f"  (burst of {len(burst)} - Shift+←/→ decides all)"
+        if reason:
+            name += f"  (likely {reason})"
+        if self.engine.report and self.engine.report.comment_of(self.current_name()):
+            name += "  💬"
+        if self.grid_mode:
+            selected = len(self.grid_targets())
+            if selected > 1:
+                name += f"  ({selected} selected - ←/→ decides all)"
+        self.image_name_label.config(text=name)
+            
+    def load_current_image(self):
+        """Load the current image, dropping entries that turn out not to be images.
+
+        Returns (image, None) with a prefetched or freshly scaled bitmap, or
+        (None, pyramid) when the zoomed image is too large to rasterize whole
+        and has to be drawn tile by tile.
+        """
+        while self.engine.image_files:
+            image_path = self.current_image_path()
+            try:
+                # Use the prefetched bitmap if it is ready, otherwise decode now
+                image = self.prefetcher.get(image_path, self.zoom_factor)
+                if image is not None:
+                    # Stands in for the pyramid until the real one is built; zooming in upscales it meanwhile
+                    original_size = (round(image.width / self.zoom_factor), round(image.height / self.zoom_factor))
+                    self.pyramid = ImagePyramid(image_path, image, original_size)
+                    return image, None
+                base, original_size = self.engine.loader.load_base(image_path, self.zoom_factor)
+                pyramid = ImagePyramid(image_path, base, original_size)
+                self.pyramid = pyramid
+                if self.use_tiles(original_size):
+                    return None, pyramid
+                return pyramid.render(self.zoom_factor), None
+            except OSError:
+                # Not a valid image file (the scan only checked its name or header), skip it
+                self.engine.image_files.pop(self.current_index)
+                if self.current_index >= len(self.engine.image_files) and self.engine.image_files:
+                    self.current_index = len(self.engine.image_files) - 1
+        return None, None
         
+    @timed('display_image')
     def display_image(self):
-        if not self.image_files:
+        if not self.engine.image_files:
+            return
+            
+        if self.grid_mode:
+            self.update_name_label()
+            self.draw_grid()
+            self.update_progress()
+            self.update_navigation_buttons()
             return
             
-        # Clear previous image
+        try:
+            # Load current image
+            image, pyramid = self.load_current_image()
+            if image is None and pyramid is None:
+                self.clear_canvas()
+                self.image_name_label.config(text="")
+                self.update_progress()
+                self.update_navigation_buttons()
+                return
+            
+            # Display the image filename
+            self.update_name_label()
+            
+            # A different image starts at the top-left corner again
+            image_path = self.current_image_path()
+            if image_path != self.shown_path:
+                self.shown_path = image_path
+                self.view_x = self.view_y = 0
+                
+            if pyramid is not None:
+                self.show_tiles(pyramid)
+            else:
+                self.show_bitmap(image)
+            self.pyramid_upscaled = False
+            # Zoom detail is decoded once the image is on screen and input has settled
+            self.root.after_idle(self.build_pyramid)
+            
+        except Exception as e:
+            messagebox.showerror("Error", f"Could not load image: {str(e)}")
+            
+        self.update_progress()
+        self.update_navigation_buttons()
+        self.prefetch_neighbours()
+        
+    def canvas_size(self):
+        canvas_width = self.canvas.winfo_width()
+        canvas_height = self.canvas.winfo_height()
+        
+        # If window dimensions are not properly set yet, use reasonable defaults
+        if canvas_width <= 1 or canvas_height <= 1:
+            canvas_width = 700
+            canvas_height = 400
+        return canvas_width, canvas_height
+        
+    def layout_view(self, width, height):
+        """Clamp the pan offset for an image of this size and return its top-left canvas position"""
+        canvas_width, canvas_height = self.canvas_size()
+        
+        # Center images smaller than the canvas, otherwise show the panned window
+        if width <= canvas_width:
+            self.view_x = 0
+            x = (canvas_width - width) // 2
+        else:
+            self.view_x = min(max(0, self.view_x), width - canvas_width)
+            x = -self.view_x
+        if height <= canvas_height:
+            self.view_y = 0
+            y = (canvas_height - height) // 2
+        else:
+            self.view_y = min(max(0, self.view_y), height - canvas_height)
+            y = -self.view_y
+        return x, y
+        
+    def use_tiles(self, original_size):
+        width, height = scaled_size(original_size, self.zoom_factor)
+        return width * height > self.max_bitmap_pixels
+        
+    def clear_canvas(self):
+        """Delete every canvas item; the next render creates its items again"""
         self.canvas.delete("all")
+        self.image_item = None
+        self.tile_items = []
+        self.tile_photos = []
         
-        # Get current image filename
-        current_image = self.image_files[self.current_index]
+    def show_bitmap(self, image):
+        """Draw an already scaled PIL image, reusing the canvas item and a pooled bitmap"""
+        if self.view_mode != 'bitmap':
+            self.clear_canvas()
+        self.view_mode = 'bitmap'
+        self.view_size = image.size
+        self.rendered_zoom = self.zoom_factor
         
-        # Display the image filename
-        self.image_name_label.config(text=current_image)
+        # Paste into a spare bitmap of this size, or convert to a new PhotoImage
+        start = time.perf_counter()
+        photo = self.photo_pool.take(image, shown=self.photo)
+        PERF.add('photoimage', start)
         
-        # Load and display current image
-        image_path = os.path.join(self.original_folder, current_image)
+        # Point the image item at it; only the first image creates the item
+        start = time.perf_counter()
+        x, y = self.layout_view(*image.size)
+        if self.image_item is None:
+            self.image_item = self.canvas.create_image(x, y, anchor=tk.NW, image=photo)
+        else:
+            self.canvas.itemconfig(self.image_item, image=photo)
+            self.canvas.coords(self.image_item, x, y)
+        self.photo = photo
+        PERF.add('draw', start)
         
-        try:
-            # Open image
-            image = Image.open(image_path)
-            
-            # Apply zoom
-            width, height = image.size
-            new_width = int(width * self.zoom_factor)
-            new_height = int(height * self.zoom_factor)
-            image = image.resize((new_width, new_height), Image.LANCZOS)
+        # Update zoom label
+        self.zoom_label.config(text=f"{int(self.zoom_factor * 100)}%")
+        
+    def show_tiles(self, pyramid, fast=False):
+        """Draw only the tiles of the zoomed image that cross the visible canvas area"""
+        if self.view_mode != 'tiles':
+            self.clear_canvas()
+        self.photo = None
+        self.view_mode = 'tiles'
+        self.rendered_zoom = self.zoom_factor
+        width, height = scaled_size(pyramid.original_size, self.zoom_factor)
+        self.view_size = (width, height)
+        x, y = self.layout_view(width, height)
+        canvas_width, canvas_height = self.canvas_size()
+        
+        size = self.tile_size
+        first_col, first_row = self.view_x // size, self.view_y // size
+        last_col = min(width - 1, self.view_x + canvas_width - 1) // size
+        last_row = min(height - 1, self.view_y + canvas_height - 1) // size
+        zoom_key = round(self.zoom_factor, 3)
+        
+        # Keep references to the visible tiles even if the LRU drops them
+        self.tile_photos = []
+        items = self.tile_items
+        for row in range(first_row, last_row + 1):
+            for col in range(first_col, last_col + 1):
+                key = (pyramid.image_path, zoom_key, col, row)
+                photo = self.tile_cache.get(key)
+                PERF.count('tiles', photo is not None)
+                if photo is None:
+                    box = (col * size, row * size, min(width, (col + 1) * size), min(height, (row + 1) * size))
+                    tile = pyramid.render_region(self.zoom_factor, box, fast)
+                    start = time.perf_counter()
+                    photo = ImageTk.PhotoImage(tile)
+                    PERF.add('photoimage', start)
+                    if not fast:
+                        self.tile_cache.put(key, photo)
+                start = time.perf_counter()
+                # Reuse the items of the last draw, in order, before creating more
+                position = (x + col * size, y + row * size)
+                if len(self.tile_photos) < len(items):
+                    item = items[len(self.tile_photos)]
+                    self.canvas.itemconfig(item, image=photo)
+                    self.canvas.coords(item, *position)
+                else:
+                    items.append(self.canvas.create_image(*position, anchor=tk.NW, image=photo))
+                self.tile_photos.append(photo)
+                PERF.add('draw', start)
+                
+        for item in items[len(self.tile_photos):]:
+            self.canvas.delete(item)
+        del items[len(self.tile_photos):]
+        
+        # Update zoom label
+        self.zoom_label.config(text=f"{int(self.zoom_factor * 100)}%")
+        
+    def start_pan(self, event):
+        if self.grid_mode:
+            # Shift extends the selection, Control toggles a cell in or out of it
+            self.grid_click(event.x, event.y, extend=bool(event.state & 0x1), toggle=bool(event.state & 0x4))
+            return
+        self.pan_anchor = (event.x, event.y)
+        
+    def drag_pan(self, event):
+        if self.pan_anchor is None:
+            return
+        dx, dy = event.x - self.pan_anchor[0], event.y - self.pan_anchor[1]
+        self.pan_anchor = (event.x, event.y)
+        self.pan_by(-dx, -dy)
+        
+    def scroll_pan(self, event, horizontal=False):
+        # Windows/macOS report a delta, X11 sends Button-4/5
+        if getattr(event, 'num', None) in (4, 5):
+            step = -60 if event.num == 4 else 60
+        else:
+            step = -60 if event.delta > 0 else 60
+        if self.grid_mode:
+            self.scroll_grid(step)
+        elif horizontal:
+            self.pan_by(step, 0)
+        else:
+            self.pan_by(0, step)
+        
+    def pan_by(self, dx, dy):
+        """Move the visible window over an image larger than the canvas"""
+        if not self.engine.image_files or self.view_size is None:
+            return
+        old_view = (self.view_x, self.view_y)
+        self.view_x += dx
+        self.view_y += dy
+        x, y = self.layout_view(*self.view_size)
+        if (self.view_x, self.view_y) == old_view:
+            return
+        if self.view_mode == 'bitmap' and self.image_item is not None:
+            self.canvas.coords(self.image_item, x, y)
+        elif self.view_mode == 'tiles' and self.pyramid and self.pyramid.image_path == self.current_image_path():
+            self.show_tiles(self.pyramid)
             
-            # Convert to PhotoImage
-            self.photo = ImageTk.PhotoImage(image)
+    def anchor_zoom(self):
+        """Keep the point at the canvas center in place when the zoom changes"""
+        if not self.rendered_zoom or self.rendered_zoom == self.zoom_factor:
+            return
+        canvas_width, canvas_height = self.canvas_size()
+        ratio = self.zoom_factor / self.rendered_zoom
+        self.view_x = int((self.view_x + canvas_width / 2) * ratio - canvas_width / 2)
+        self.view_y = int((self.view_y + canvas_height / 2) * ratio - canvas_height / 2)
+        
+    def current_image_path(self):
+        return os.path.join(self.engine.original_folder, self.engine.image_files[self.current_index])
+        
+    def build_pyramid(self, zoom_factor=None):
+        """Start building the zoom pyramid of the current image in the background.
+
+        The result is collected by poll_pyramid; until then zoom steps upscale
+        whatever the current pyramid holds.
+        """
+        if not self.engine.image_files or self.grid_mode:
+            return
+        image_path = self.current_image_path()
+        if self.pyramid and self.pyramid.image_path != image_path:
+            self.pyramid = None
+        if zoom_factor is None:
+            zoom_factor = self.zoom_factor * self.pyramid_headroom
+        # Past 100% the full resolution original is the best base there is
+        zoom_factor = min(zoom_factor, 1.0)
+        if self.pyramid and self.pyramid.covers(zoom_factor):
+            return
+        target = self.pyramid_target
+        if self.pyramid_future and target[0] == image_path and target[1] >= zoom_factor:
+            return
+        
+        def build():
+            base, original_size = self.engine.loader.load_base(image_path, zoom_factor)
+            return ImagePyramid(image_path, base, original_size)
+        
+        if self.pyramid_future:
+            self.pyramid_future.cancel()
+        self.pyramid_future = self.pyramid_executor.submit(build)
+        self.pyramid_target = (image_path, zoom_factor)
+        if self.pyramid_poll_job is None:
+            self.pyramid_poll_job = self.root.after(self.pyramid_poll_interval, self.poll_pyramid)
+        
+    def current_pyramid(self):
+        """Return the current image's pyramid (None without one), starting a build if it doesn't cover the zoom"""
+        image_path = self.current_image_path()
+        self.collect_pyramid(image_path)
+        if not (self.pyramid and self.pyramid.covers(self.zoom_factor)):
+            # Zoomed past what the pyramid holds - rebuild with headroom for the new zoom
+            self.build_pyramid()
+        return self.pyramid
+        
+    def collect_pyramid(self, image_path):
+        """Keep a finished pyramid build if it is still current; never waits for one"""
+        if self.pyramid and self.pyramid.image_path != image_path:
+            self.pyramid = None
+        if not self.pyramid_future or not self.pyramid_future.done():
+            return
+        future, self.pyramid_future = self.pyramid_future, None
+        try:
+            pyramid = future.result()
+        except Exception:
+            return
+        if pyramid.image_path == image_path:
+            self.pyramid = pyramid
             
-            # Center image on canvas
-            canvas_width = self.canvas.winfo_width()
-            canvas_height = self.canvas.winfo_height()
+    def poll_pyramid(self):
+        """Pick up a finished pyramid build and redraw a zoom that was only upscaled"""
+        self.pyramid_poll_job = None
+        if not self.pyramid_future:
+            return
+        if not self.pyramid_future.done():
+            self.pyramid_poll_job = self.root.after(self.pyramid_poll_interval, self.poll_pyramid)
+            return
+        if not self.engine.image_files or self.grid_mode:
+            self.pyramid_future = None
+            return
+        pyramid = self.current_pyramid()
+        if self.pyramid_upscaled and pyramid and pyramid.covers(self.zoom_factor):
+            self.pyramid_upscaled = False
+            self.render_pyramid(pyramid)
+        
+    def request_render(self, kind):
+        """Ask for a redraw on the next frame; requests in between collapse into one.
+
+        kind is 'layout' (reposition what is on the canvas), 'zoom' (re-render
+        at the current zoom) or 'image' (load the current image); the strongest
+        pending request wins.
+        """
+        if self.render_pending is None or self.RENDER_KINDS.index(kind) > self.RENDER_KINDS.index(self.render_pending):
+            self.render_pending = kind
+        if kind == 'zoom':
+            # Instant feedback while the render waits for its frame
+            self.zoom_label.config(text=f"{int(self.zoom_factor * 100)}%")
+        if self.render_job is None:
+            # Wait a frame, then for the input that piled up meanwhile to be handled
+            self.render_job = self.root.after(self.frame_interval, lambda: self.root.after_idle(self.flush_render))
             
-            # If window dimensions are not properly set yet, use reasonable defaults
-            if canvas_width <= 1 or canvas_height <= 1:
-                canvas_width = 700
-                canvas_height = 400
-                
-            x = max(0, (canvas_width - new_width) // 2)
-            y = max(0, (canvas_height - new_height) // 2)
+    def flush_render(self):
+        kind = self.render_pending
+        self.render_job = self.render_pending = None
+        if not self.engine.image_files or kind is None:
+            return
+        if self.grid_mode:
+            self.draw_grid()
+        elif kind == 'image':
+            self.display_image()
+        elif kind == 'zoom':
+            self.show_zoomed()
+        else:
+            self.relayout()
+        if kind != 'layout' and self.engine.image_files:
+            # At most one line per frame however fast keys repeat, so a crash loses no more than that
+            self.engine.save_view(self.current_index, self.zoom_factor)
             
-            # Draw image on canvas
-            self.canvas.create_image(x, y, anchor=tk.NW, image=self.photo)
+    def on_canvas_configure(self, event):
+        if (event.width, event.height) != self.canvas_dims:
+            self.canvas_dims = (event.width, event.height)
+            self.request_render('layout')
             
-            # Update zoom label
-            self.zoom_label.config(text=f"{int(self.zoom_factor * 100)}%")
+    def relayout(self):
+        """Fit what is on the canvas to its new size without rendering the image again"""
+        if self.view_size is None:
+            return
+        x, y = self.layout_view(*self.view_size)
+        if self.view_mode == 'bitmap' and self.image_item is not None:
+            self.canvas.coords(self.image_item, x, y)
+        elif self.view_mode == 'tiles' and self.pyramid and self.pyramid.image_path == self.current_image_path():
+            # More or fewer tiles are visible now; the rest come from the tile cache
+            self.show_tiles(self.pyramid)
             
+    def show_zoomed(self):
+        """Redraw the current image at the new zoom from its pyramid"""
+        try:
+            pyramid = self.current_pyramid()
+            if pyramid is None:
+                self.display_image()
+                return
+            # Cheap filter while zoom keys keep coming, LANCZOS once input settles
+            self.anchor_zoom()
+            self.pyramid_upscaled = not pyramid.covers(self.zoom_factor)
+            self.render_pyramid(pyramid, fast=True)
         except Exception as e:
             messagebox.showerror("Error", f"Could not load image: {str(e)}")
+            return
             
-        self.update_progress()
-        self.update_navigation_buttons()
+        if self.zoom_refine_job:
+            self.root.after_cancel(self.zoom_refine_job)
+        self.zoom_refine_job = self.root.after(self.zoom_refine_delay, self.refine_zoom)
+        
+    def refine_zoom(self):
+        self.zoom_refine_job = None
+        if self.pyramid and self.engine.image_files and self.pyramid.image_path == self.current_image_path():
+            self.render_pyramid(self.pyramid)
+            
+    def render_pyramid(self, pyramid, fast=False):
+        if self.use_tiles(pyramid.original_size):
+            self.show_tiles(pyramid, fast)
+        else:
+            self.show_bitmap(pyramid.render(self.zoom_factor, fast))
+        
+    def prefetch_neighbours(self):
+        """Queue the next and previous images for background decoding"""
+        if self.grid_mode:
+            # The grid queues thumbnails for whatever it draws
+            self.request_render('layout')
+            return
+        prefetcher = self.prefetcher
+        indexes = []
+        for offset in range(1, max(prefetcher.ahead, prefetcher.behind) + 1):
+            if offset <= prefetcher.ahead and self.current_index + offset < len(self.engine.image_files):
+                indexes.append(self.current_index + offset)
+            if offset <= prefetcher.behind and self.current_index - offset >= 0:
+                indexes.append(self.current_index - offset)
+        paths = [os.path.join(self.engine.original_folder, self.engine.image_files[i]) for i in indexes]
+        prefetcher.schedule(paths, self.zoom_factor)
         
     def zoom_in(self):
-        if not self.image_files:
+        if not self.engine.image_files:
             return
             
         # Don't allow zooming in above 500%
@@ -597,10 +4047,10 @@ class ImageApprover:
         else:
             self.zoom_factor = self.max_zoom
             
-        self.display_image()
+        self.request_render('zoom')
         
     def zoom_out(self):
-        if not self.image_files:
+        if not self.engine.image_files:
             return
             
         # Don't allow zooming out below 10%
@@ -609,34 +4059,200 @@ class ImageApprover:
         else:
             self.zoom_factor = self.min_zoom
             
-        self.display_image()
+        self.request_render('zoom')
         
     def reset_zoom(self):
-        if not self.image_files:
+        if not self.engine.image_files:
             return
             
-        self.zoom_factor = 0.4  # Reset to 40% instead of 100%
-        self.display_image()
+        self.zoom_factor = DEFAULT_ZOOM  # Reset to 40% instead of 100%
+        self.request_render('zoom')
         
     def previous_image(self):
-        if not self.image_files or self.current_index <= 0:
+        if not self.engine.image_files or self.current_index <= 0:
             return
             
         self.current_index -= 1
         # Don't reset zoom when navigating - keep current zoom level
-        self.display_image()
+        self.show_target()
         
     def next_image(self):
-        if not self.image_files or self.current_index >= len(self.image_files) - 1:
+        if not self.engine.image_files or self.current_index >= len(self.engine.image_files) - 1:
             return
             
         self.current_index += 1
         # Don't reset zoom when navigating - keep current zoom level
-        self.display_image()
+        self.show_target()
+        
+    def toggle_grid(self):
+        """Switch between the single image and the contact-sheet grid"""
+        self.grid_mode = not self.grid_mode
+        self.grid_var.set(self.grid_mode)
+        self.grid_selection.clear()
+        self.grid_anchor = None
+        # Neither view can reuse what the other left on the canvas
+        self.clear_canvas()
+        self.photo = self.view_mode = self.view_size = None
+        self.shown_path = None
+        if self.grid_mode:
+            self.grid_follow = True
+            self.select_burst()
+        else:
+            self.thumbnails.want(())
+            self.grid_photos.clear()
+        if self.engine.image_files:
+            self.show_target()
+            
+    def grid_layout(self):
+        """Return (columns, left margin) of the grid for the current canvas width"""
+        canvas_width, _ = self.canvas_size()
+        columns = max(1, canvas_width // self.grid_cell)
+        return columns, (canvas_width - columns * self.grid_cell) // 2
+        
+    def draw_grid(self):
+        """Draw the cells on screen; everything scrolled away has no items or PhotoImages"""
+        self.clear_canvas()
+        image_files = self.engine.image_files
+        if not image_files:
+            return
+        start = time.perf_counter()
+        cell = self.grid_cell
+        _, canvas_height = self.canvas_size()
+        columns, left = self.grid_layout()
+        rows = -(-len(image_files) // columns)
+        if self.grid_follow:
+            row_top = self.current_index // columns * cell
+            self.grid_scroll = max(min(self.grid_scroll, row_top), row_top + cell - canvas_height)
+            self.grid_follow = False
+        self.grid_scroll = max(0, min(self.grid_scroll, rows * cell - canvas_height))
+        
+        first = self.grid_scroll // cell * columns
+        last = min(len(image_files), ((self.grid_scroll + canvas_height - 1) // cell + 1) * columns)
+        caption_color = "#CCCCCC" if self.theme == 'dark' else "#333333"
+        # The current image's near-duplicates are outlined with it
+        burst = {image_files.slots[name] for name in self.engine.burst_of(image_files[self.current_index])} \
+            if self.current_index < len(image_files) else set()
+        visible = []
+        for position in range(first, last):
+            row, column = divmod(position, columns)
+            x = left + column * cell
+            y = row * cell - self.grid_scroll
+            name = image_files[position]
+            image_path = self.engine.path_of(name)
+            visible.append(image_path)
+            if image_files.slot_at(position) in self.grid_selection:
+                self.canvas.create_rectangle(x + 2, y + 2, x + cell - 2, y + cell - 2, fill="#2D5A88", outline="")
+            if position == self.current_index:
+                self.canvas.create_rectangle(x + 2, y + 2, x + cell - 2, y + cell - 2, outline="#FFD54F", width=2)
+            elif image_files.slot_at(position) in burst:
+                self.canvas.create_rectangle(x + 3, y + 3, x + cell - 3, y + cell - 3, outline="#FFD54F", dash=(4, 3))
+            photo = self.grid_photo(image_path)
+            if photo is not None:
+                self.canvas.create_image(x + cell // 2, y + (cell - 12) // 2, image=photo, anchor=tk.CENTER)
+            caption = name if len(name) <= 22 else name[:10] + "…" + name[-10:]
+            self.canvas.create_text(x + cell // 2, y + cell - 12, text=caption, fill=caption_color, font=("Arial", 8))
+        PERF.add('draw', start)
+        
+        # Drop queued thumbnails that scrolled away and watch for the rest
+        self.thumbnails.want(visible)
+        if self.thumbnails.busy and self.grid_poll_job is None:
+            self.grid_poll_job = self.root.after(50, self.poll_thumbnails)
+            
+    def grid_photo(self, image_path):
+        """PhotoImage of a cell's thumbnail, or None while the thumbnail is being made"""
+        photo = self.grid_photos.get(image_path)
+        if photo is None:
+            thumbnail = self.thumbnails.get(image_path)
+            if thumbnail is not None:
+                photo = ImageTk.PhotoImage(thumbnail)
+                self.grid_photos.put(image_path, photo)
+        return photo
+        
+    def poll_thumbnails(self):
+        """Redraw the grid as thumbnails come in from the workers"""
+        self.grid_poll_job = None
+        if not self.grid_mode:
+            return
+        if self.thumbnails.take_ready():
+            self.request_render('layout')
+        if self.thumbnails.busy:
+            self.grid_poll_job = self.root.after(50, self.poll_thumbnails)
+            
+    def scroll_grid(self, step):
+        self.grid_scroll += step
+        self.request_render('layout')
+        
+    def grid_position_at(self, x, y):
+        """Queue position of the cell under a canvas point, or None"""
+        columns, left = self.grid_layout()
+        column = (x - left) // self.grid_cell
+        if not 0 <= column < columns or y < 0:
+            return None
+        position = (y + self.grid_scroll) // self.grid_cell * columns + column
+        return position if position < len(self.engine.image_files) else None
+        
+    def grid_click(self, x, y, extend=False, toggle=False):
+        """Make the clicked cell current and update the selection like a file manager"""
+        position = self.grid_position_at(x, y)
+        if position is None:
+            return
+        image_files = self.engine.image_files
+        slot = image_files.slot_at(position)
+        if toggle:
+            self.grid_selection ^= {slot}
+            self.grid_anchor = slot
+        elif extend and self.grid_anchor is not None and image_files.is_queued(self.grid_anchor):
+            anchor = image_files.position_of(self.grid_anchor)
+            low, high = sorted((anchor, position))
+            self.grid_selection.update(image_files.slot_at(p) for p in range(low, high + 1))
+        else:
+            self.grid_selection = {slot}
+            self.grid_anchor = slot
+        self.current_index = position
+        self.show_target()
+        
+    def open_grid_cell(self, event):
+        """Double-click: look at a cell in the single image view"""
+        if not self.grid_mode:
+            return
+        position = self.grid_position_at(event.x, event.y)
+        if position is not None:
+            self.current_index = position
+            self.toggle_grid()
+            
+    def select_burst(self):
+        """Select the current image's burst in the grid, unless something is selected already"""
+        name = self.current_name()
+        if not self.grid_mode or self.grid_selection or name is None:
+            return
+        burst = self.engine.burst_of(name)
+        if len(burst) > 1:
+            self.grid_selection = {self.engine.image_files.slots[other] for other in burst}
+            self.grid_anchor = self.engine.image_files.slots[name]
+            
+    def grid_targets(self):
+        """Slots a decision in the grid applies to: the selection, or else the current cell"""
+        image_files = self.engine.image_files
+        slots = sorted(slot for slot in self.grid_selection if image_files.is_queued(slot))
+        if not slots and self.current_index < len(image_files):
+            slots = [image_files.slot_at(self.current_index)]
+        return slots
+        
+    def show_target(self):
+        """Point the labels at the new current image now and draw it on the next frame.
+
+        Decisions and navigation only touch the queue model; when keys come in
+        faster than images decode, the images skipped over are never rendered.
+        """
+        self.update_name_label()
+        self.update_progress()
+        self.update_navigation_buttons()
+        self.grid_follow = True
+        self.request_render('image')
         
     def update_navigation_buttons(self):
         # Enable/disable navigation buttons based on current position
-        if not self.image_files:
+        if not self.engine.image_files:
             self.prev_btn.state(['disabled'])
             self.next_btn.state(['disabled'])
             return
@@ -648,114 +4264,338 @@ class ImageApprover:
             self.prev_btn.state(['disabled'])
             
         # Next button
-        if self.current_index < len(self.image_files) - 1:
+        if self.current_index < len(self.engine.image_files) - 1:
             self.next_btn.state(['!disabled'])
         else:
             self.next_btn.state(['disabled'])
             
-    def approve_image(self):
-        if not self.image_files:
+    def decide_category(self, category, burst=False):
+        """Sort the current image (or its burst, or the grid selection) into a category"""
+        if not self.engine.image_files:
             return
             
-        self.move_image(self.approved_folder, "approved")
+        self.move_image(self.engine.routes.folders[category], category, burst)
         
-    def disapprove_image(self):
-        if not self.image_files:
+    def comment_current(self):
+        """Add or edit the report comment of the image on screen"""
+        name = self.current_name()
+        report = self.engine.report
+        if name is None or report is None:
             return
+        text = simpledialog.askstring("Comment", f"Comment on {name}:", initialvalue=report.comment_of(name) or "",
+                                      parent=self.root)
+        if text is not None:
+            report.comment(name, text.strip())
+            self.update_name_label()
             
-        self.move_image(self.disapproved_folder, "disapproved")
-        
-    def move_image(self, destination_folder, action):
-        if not self.image_files:
+    def export_report(self):
+        """Save the decision report of this folder as CSV or JSON Lines"""
+        report = self.engine.report
+        if report is None:
+            messagebox.showinfo("Report", "Open a folder first - the report records its decisions.")
             return
-            
-        # Get current image
-        current_image = self.image_files[self.current_index]
-        source_path = os.path.join(self.original_folder, current_image)
-        destination_path = os.path.join(destination_folder, current_image)
+        path = filedialog.asksaveasfilename(
+            title="Export decision report", defaultextension=".csv", initialfile="decisions.csv",
+            filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl")]
+        )
+        if not path:
+            return
+        # Serializing a large report takes a moment - do it off the Tk thread
+        rows = report.snapshot()
+        result = queue.Queue()
+        
+        def run():
+            try:
+                result.put(report.export(path, rows))
+            except OSError as e:
+                result.put(e)
+                
+        threading.Thread(target=run, name="report-export", daemon=True).start()
+        self.poll_report_export(result, path)
         
+    def poll_report_export(self, result, path):
         try:
-            # Save operation to undo stack
-            self.undo_stack.append({
-                'file': current_image,
-                'from': self.original_folder,
-                'to': destination_folder,
-                'action': action
-            })
-            
-            # Enable undo button
-            self.undo_btn.state(['!disabled'])
-            
-            # Move file
-            shutil.move(source_path, destination_path)
-            
-            # Don't reset zoom - keep current zoom level
-            
-            # Remove from list
-            self.image_files.pop(self.current_index)
+            outcome = result.get_nowait()
+        except queue.Empty:
+            self.root.after(50, lambda: self.poll_report_export(result, path))
+            return
+        if isinstance(outcome, Exception):
+            messagebox.showerror("Error", f"Could not export the report: {str(outcome)}")
+        else:
+            messagebox.showinfo("Report", f"{outcome} row(s) written to {path}")
+        
+    def bind_routes(self):
+        """Bind each category's key and make buttons for all but approved/disapproved"""
+        for sequence in self.route_bindings:
+            self.root.unbind(sequence)
+        for button in self.route_buttons:
+            button.destroy()
+        self.route_bindings = []
+        self.route_buttons = []
+        
+        routes = self.engine.routes.keys if self.engine.routes else RoutingTable.DEFAULTS
+        for category, key in routes.items():
+            # Tk keeps the key -> handler table, so a keypress costs the same for any number of categories
+            bindings = [(f'<Key-{key}>', False), (RoutingTable.burst_key(key), True)]
+            for sequence, burst in bindings:
+                if sequence:
+                    self.root.bind(sequence, lambda event, category=category, burst=burst: self.decide_category(category, burst))
+                    self.route_bindings.append(sequence)
+            if category not in RoutingTable.DEFAULTS:
+                button = ttk.Button(self.route_frame, text=f"{category} ({key})", command=lambda category=category: self.decide_category(category), style="TButton")
+                button.pack(side=tk.LEFT, padx=(5, 0))
+                self.route_buttons.append(button)
+        self.set_decision_buttons(bool(self.engine.image_files))
+        
+    def set_decision_buttons(self, enabled):
+        for button in [self.disapprove_btn, self.approve_btn] + self.route_buttons:
+            button.state(['!disabled'] if enabled else ['disabled'])
+        
+    @timed('move_image')
+    def move_image(self, destination_folder, action, burst=False):
+        """Decide the current image, with burst its whole near-duplicate group, or the grid selection"""
+        if not self.engine.image_files:
+            return
             
-            # Adjust index if needed
-            if self.current_index >= len(self.image_files) and self.image_files:
-                self.current_index = len(self.image_files) - 1
-                
-            # Display next image or finish
-            if self.image_files:
-                self.display_image()
+        try:
+            if self.grid_mode:
+                records = self.engine.decide_group(self.grid_targets(), destination_folder, action)
+                self.grid_selection.clear()
+                # Whatever followed the first decided cell takes its place
+                self.current_index = self.engine.image_files.position_of(records[0].position)
+            elif burst:
+                records = self.engine.decide_burst(self.current_index, destination_folder, action)
+                # Members before the current image shift what takes its place
+                self.current_index = self.engine.image_files.position_of(records[0].position)
             else:
-                self.canvas.delete("all")
-                self.image_name_label.config(text="")
-                self.progress_label.config(text="All images processed!")
-                self.progress_bar['value'] = self.progress_bar['maximum']
-                self.disapprove_btn.state(['disabled'])
-                self.approve_btn.state(['disabled'])
-                self.undo_btn.state(['disabled'])
-                self.prev_btn.state(['disabled'])
-                self.next_btn.state(['disabled'])
+                records = [self.engine.decide(self.current_index, destination_folder, action)]
+            for record in records:
+                if record.deferred:
+                    self.update_commit_button()
+                else:
+                    self.prefetcher.discard(self.engine.path_of(record.file))
+            self.after_decision()
                 
         except Exception as e:
             messagebox.showerror("Error", f"Could not move file: {str(e)}")
             
+    def after_decision(self):
+        """Show whatever comes next once the current image has been decided"""
+        image_files = self.engine.image_files
+        
+        # Enable undo button
+        self.undo_btn.state(['!disabled'])
+        self.update_redo_button()
+        
+        # Don't reset zoom - keep current zoom level
+        
+        # Adjust index if needed
+        if self.current_index >= len(image_files) and image_files:
+            self.current_index = len(image_files) - 1
+            
+        # Display next image or finish
+        if image_files:
+            # In the grid the next image comes up with its burst selected
+            self.select_burst()
+            self.show_target()
+        else:
+            self.clear_canvas()
+            self.image_name_label.config(text="")
+            self.progress_label.config(text="All images processed!")
+            self.progress_bar['value'] = self.progress_bar['maximum']
+            self.set_decision_buttons(False)
+            self.undo_btn.state(['disabled'])
+            self.prev_btn.state(['disabled'])
+            self.next_btn.state(['disabled'])
+            
     def undo_last_action(self):
-        if not self.undo_stack:
+        if not self.engine.undo_log:
             return
-            
-        # Get last operation
-        last_operation = self.undo_stack.pop()
         
-        try:
-            # Move file back
-            source_path = os.path.join(last_operation['to'], last_operation['file'])
-            destination_path = os.path.join(last_operation['from'], last_operation['file'])
-            shutil.move(source_path, destination_path)
+        # Files moved by a bulk commit can only be moved back once it is done
+        if self.commit_thread:
+            self.commit_thread.join()
+            self.poll_commit()
             
-            # Add back to image list
-            self.image_files.append(last_operation['file'])
+        try:
+            record = self.engine.undo()
+            self.update_commit_button()
             
-            # Set current index to the restored image
-            self.current_index = len(self.image_files) - 1
+            # Show the image again in its old place
+            self.current_index = self.engine.image_files.position_of(record.position)
             
             # Don't reset zoom - keep current zoom level
             
             # Display image
-            self.display_image()
+            self.show_target()
             
             # Re-enable buttons if needed
             if 'disabled' in self.disapprove_btn.state():
-                self.disapprove_btn.state(['!disabled'])
-                self.approve_btn.state(['!disabled'])
+                self.set_decision_buttons(True)
                 self.update_navigation_buttons()
                 
         except Exception as e:
             messagebox.showerror("Error", f"Could not undo operation: {str(e)}")
             
-        # Disable undo button if stack is empty
-        if not self.undo_stack:
+        # Disable undo button if the log is empty
+        if not self.engine.undo_log:
             self.undo_btn.state(['disabled'])
+        self.update_redo_button()
+            
+    def redo_last_action(self):
+        """Apply the most recently undone decision again"""
+        try:
+            position = self.engine.redo()
+        except Exception as e:
+            messagebox.showerror("Error", f"Could not move file: {str(e)}")
+            return
+        if position is None:
+            self.update_redo_button()
+            return
+        self.current_index = position
+        self.update_commit_button()
+        self.after_decision()
+        
+    def update_redo_button(self):
+        if self.engine.undo_log.can_redo():
+            self.redo_btn.state(['!disabled'])
+        else:
+            self.redo_btn.state(['disabled'])
+            
+    def toggle_perf_overlay(self):
+        self.perf_overlay = not self.perf_overlay
+        if self.perf_overlay:
+            self.perf_label.place(x=8, y=8)
+            self.update_perf_overlay()
+        else:
+            self.perf_label.place_forget()
+            
+    def update_perf_overlay(self):
+        """Refresh the p50/p95 timings and cache hit rates twice a second while shown"""
+        if not self.perf_overlay:
+            return
+        lines = [f"{'':14}{'n':>6}{'p50 ms':>9}{'p95 ms':>9}"]
+        for name, (count, p50, p95) in sorted(PERF.summary().items()):
+            lines.append(f"{name:14}{count:>6}{p50:>9.1f}{p95:>9.1f}")
+        for cache, rate in sorted(PERF.hit_rates().items()):
+            lines.append(f"{cache + ' hits':20}{rate:>9.0%}")
+        lines.append("Shift+F12: export trace")
+        self.perf_label.config(text="\n".join(lines))
+        self.root.after(500, self.update_perf_overlay)
+        
+    def export_trace(self):
+        """Save the recorded timings for chrome://tracing or Perfetto"""
+        path = filedialog.asksaveasfilename(defaultextension=".json", initialfile="approveit-trace.json",
+                                            filetypes=[("Chrome trace", "*.json")])
+        if not path:
+            return
+        try:
+            PERF.export_chrome_trace(path)
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not write trace: {str(e)}")
+            
+    def toggle_defer_moves(self):
+        self.engine.defer_moves = bool(self.defer_var.get())
+        
+    def toggle_prescreen(self):
+        """Send images that look blurry or badly exposed to the back of the queue"""
+        self.engine.prescreen = 'defer' if self.prescreen_var.get() else None
+        current_name = self.current_name()
+        if self.engine.apply_prescreen(keep=current_name):
+            self.keep_current(current_name)
+        
+    def update_commit_button(self):
+        count = len(self.engine.pending_decisions)
+        self.commit_btn.config(text=f"⤓ Commit ({count})" if count else "⤓ Commit")
+        if count and not self.commit_thread:
+            self.commit_btn.state(['!disabled'])
+        else:
+            self.commit_btn.state(['disabled'])
+            
+    def commit_decisions(self, wait=False):
+        """Move every tagged file in one bulk pass on a background thread"""
+        if not self.engine.pending_decisions or self.commit_thread:
+            return
+        moves = self.engine.take_pending_moves()
+        mover = self.engine.mover
+        
+        def run():
+            failures = mover.move_batch(moves, progress=lambda done, total: self.commit_progress.put((done, total)))
+            self.commit_progress.put(failures)
+        
+        self.commit_thread = threading.Thread(target=run, name="commit", daemon=True)
+        self.commit_thread.start()
+        self.update_commit_button()
+        if wait:
+            self.commit_thread.join()
+        self.poll_commit()
+        
+    def poll_commit(self):
+        """Show commit progress and wrap up once the batch is done"""
+        if self.commit_thread is None:
+            return
+        failures = None
+        while True:
+            try:
+                item = self.commit_progress.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, list):
+                failures = item
+            else:
+                done, total = item
+                self.progress_label.config(text=f" Committing {done}/{total}")
+                
+        if failures is None:
+            self.root.after(100, self.poll_commit)
+            return
+            
+        self.commit_thread = None
+        self.update_commit_button()
+        for source_path, destination_path, error in failures:
+            # The file stays where it was - drop the decision and review it again
+            self.engine.recover_failed_move(source_path, destination_path=destination_path)
+        self.update_progress()
+        if failures:
+            self.update_navigation_buttons()
+            messagebox.showerror("Error", f"Could not move {len(failures)} file(s), first error: {str(failures[0][2])}")
             
+    def resolve_pending_decisions(self):
+        """Offer to commit tagged decisions; returns False if the user cancelled"""
+        if self.commit_thread:
+            self.commit_thread.join()
+            self.poll_commit()
+        if not self.engine.pending_decisions:
+            return True
+        answer = messagebox.askyesnocancel(
+            "Uncommitted Decisions",
+            f"{len(self.engine.pending_decisions)} decision(s) have not been committed yet. Move the files now?"
+        )
+        if answer is None:
+            return False
+        if answer:
+            self.commit_decisions(wait=True)
+        else:
+            self.engine.drop_pending()
+            self.update_commit_button()
+        return True
+        
+    def poll_moves(self):
+        """Report background moves that failed and put their files back in the list"""
+        for job, source_path, destination_path, error in self.engine.mover.drain_errors():
+            if self.engine.recover_failed_move(source_path, job=job):
+                if len(self.engine.image_files) == 1:
+                    self.current_index = 0
+                    self.display_image()
+                    self.set_decision_buttons(True)
+                self.update_progress()
+                self.update_navigation_buttons()
+            messagebox.showerror("Error", f"Could not move file {os.path.basename(source_path)}: {str(error)}")
+        self.root.after(200, self.poll_moves)
+        
     def update_progress(self):
-        total_processed = len(self.undo_stack)
-        total_images = len(self.image_files) + total_processed
-        remaining = len(self.image_files)
+        remaining, total_processed = self.engine.progress()
+        total_images = remaining + total_processed
         
         if total_images > 0:
             progress_value = (total_processed / total_images) * 100
@@ -763,12 +4603,161 @@ class ImageApprover:
         else:
             self.progress_bar['value'] = 0
 
-        self.progress_label.config(text=f" {remaining}/{total_images}")
+        if self.engine.scanning():
+            status = " (scanning...)"
+        elif self.engine.indexing():
+            status = f" (indexing {self.engine.indexer.done}/{len(self.engine.indexer.names)})"
+        else:
+            status = ""
+        self.progress_label.config(text=f" {remaining}/{total_images}{status}")
+
+def print_progress(label):
+    """Progress callback for the command line, rewriting one status line"""
+    def report(done, total):
+        if done == total or done % 100 == 0:
+            print(f"\r{label} {done}/{total}", end="\n" if done == total else "", file=sys.stderr, flush=True)
+    return report
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(
+        description="ApproveIT - sort images into approved, disapproved and other category folders. "
+                    "Run without a command to open the window."
+    )
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    
+    scan = commands.add_parser("scan", help="list the image files of a folder")
+    scan.add_argument("folder")
+    
+    index = commands.add_parser("index", help="validate a folder on all cores and write its index file")
+    index.add_argument("folder")
+    index.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    index.add_argument("--bursts", action="store_true", help="print groups of near-duplicate images")
+    index.add_argument("--prescreen", choices=["report", "reject"],
+                       help="list images that look blurry or badly exposed, or move them to disapproved")
+    
+    cache = commands.add_parser("build-cache", help="decode previews for a folder into the preview cache")
+    cache.add_argument("folder")
+    cache.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    
+    routes = commands.add_parser("routes", help="create a folder's category folders and list their keys")
+    routes.add_argument("folder")
+    
+    report = commands.add_parser("report", help="export a folder's decision report (file, decision, time, reviewer, comment)")
+    report.add_argument("folder")
+    report.add_argument("--output", help="CSV (.csv) or JSON Lines file to write (default: CSV on stdout)")
+    
+    apply = commands.add_parser("apply", help="move files according to a CSV/JSON decision file")
+    apply.add_argument("folder")
+    apply.add_argument("decisions", help="CSV with file,decision columns, or JSON / JSON Lines")
+    apply.add_argument("--workers", type=int, default=4, help="parallel copies for cross-device moves")
+    apply.add_argument("--reviewer", help="name recorded in the decision report (default: $APPROVEIT_REVIEWER or login)")
+    return parser
+
+
+def run_command(args):
+    """Run a headless command-line command and return the exit status"""
+    if not os.path.isdir(args.folder):
+        print(f"Not a folder: {args.folder}", file=sys.stderr)
+        return 2
+    if args.command == "report":
+        report = DecisionReport(args.folder).load()
+        if args.output:
+            count = report.export(args.output)
+            print(f"{count} row(s) written to {args.output}", file=sys.stderr)
+        else:
+            report.write_rows(sys.stdout)
+        return 0
+    if args.command in ("routes", "apply") or getattr(args, "prescreen", None) == "reject":
+        try:
+            routes = RoutingTable.load(args.folder)
+        except (OSError, ValueError) as e:
+            print(f"Invalid routing table: {e}", file=sys.stderr)
+            return 2
+    else:
+        # Nothing is moved, so the destinations don't matter
+        routes = RoutingTable(args.folder)
+        
+    preview_cache = ApprovalEngine.open_preview_cache() if args.command == "build-cache" else None
+    engine = ApprovalEngine(preview_cache=preview_cache)
+    try:
+        if args.command == "scan":
+            engine.open_folder(args.folder, create_folders=False, routes=routes)
+            for name in engine.scan():
+                print(name)
+            print(f"{len(engine.image_files)} image(s)", file=sys.stderr)
+            
+        elif args.command == "index":
+            engine.open_folder(args.folder, create_folders=args.prescreen == "reject", routes=routes)
+            engine.prescreen = args.prescreen
+            engine.scan()
+            indexer = engine.start_index(args.workers)
+            report = print_progress("Indexing")
+            while not indexer.finished:
+                indexer.thread.join(0.2)
+                engine.drain_index()
+                if indexer.names:
+                    report(indexer.done, len(indexer.names))
+            print(f"{len(engine.image_files)} valid image(s), index written to {indexer.index.path}", file=sys.stderr)
+            if args.bursts:
+                groups = {id(group): group for group in engine.bursts.values()}
+                for group in groups.values():
+                    group = [name for name in group if name in engine.image_files]
+                    if len(group) > 1:
+                        print("\t".join(group))
+            if args.prescreen:
+                for name, reason in engine.flagged.items():
+                    print(f"{name}\t{reason}")
+                if engine.auto_rejected:
+                    print(f"{len(engine.auto_rejected)} image(s) moved to {engine.disapproved_folder}", file=sys.stderr)
+            
+        elif args.command == "build-cache":
+            if preview_cache is None:
+                print("The preview cache is disabled or unavailable", file=sys.stderr)
+                return 1
+            engine.open_folder(args.folder, create_folders=False, routes=routes)
+            added = engine.build_preview_cache(args.workers, print_progress("Building previews"))
+            print(f"{added} preview(s) added to {preview_cache.db_path}", file=sys.stderr)
+            
+        elif args.command == "routes":
+            engine.open_folder(args.folder, routes=routes)
+            for category, key in routes.keys.items():
+                how = "rename" if routes.same_device[category] else "copy"
+                print(f"{category}\t{key}\t{routes.folders[category]}\t{how}")
+            
+        elif args.command == "apply":
+            engine.open_folder(args.folder, routes=routes)
+            engine.open_report(args.reviewer)
+            try:
+                moved, failures, missing = engine.apply_decision_file(
+                    args.decisions, args.workers, print_progress("Moving")
+                )
+            except (OSError, ValueError) as e:
+                print(f"Could not read decisions: {e}", file=sys.stderr)
+                return 2
+            for source_path, destination_path, error in failures:
+                print(f"Could not move {source_path}: {error}", file=sys.stderr)
+            if missing:
+                print(f"{len(missing)} file(s) in the decision file were not found", file=sys.stderr)
+            print(f"{moved} file(s) moved", file=sys.stderr)
+            return 1 if failures else 0
+    finally:
+        engine.close()
+    return 0
+
 
-def main():
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    if args.command:
+        return run_command(args)
+        
+    if tk is None:
+        print("Tk is not available - use one of the commands to run headless (see --help)", file=sys.stderr)
+        return 1
     root = tk.Tk()
     app = ImageApprover(root)
     root.mainloop()
+    return 0
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,628 @@
+"""Tests for the pure-logic parts of image_approver (run with python -m pytest)"""
+
+import csv
+import json
+import os
+import random
+import threading
+import time
+
+import pytest
+from PIL import Image
+
+import image_approver
+from image_approver import (ApprovalEngine, FileMover, FolderWatcher, ReviewQueue, SessionLog, UndoLog,
+                            UndoRecord, banded_decode, read_decision_file)
+
+
+def test_review_queue_matches_a_list():
+    rng = random.Random(7)
+    review_queue = ReviewQueue(f"img{i}" for i in range(50))
+    names = list(review_queue.names)  # slot -> name
+    queued = [True] * len(names)
+    removed = []
+
+    def expected():
+        return [name for name, is_queued in zip(names, queued) if is_queued]
+
+    for step in range(3000):
+        action = rng.random()
+        if action < 0.35 and len(review_queue):
+            position = rng.randrange(-len(review_queue), len(review_queue))
+            slot = review_queue.remove_at(position)
+            assert names[slot] == expected()[position]
+            queued[slot] = False
+            removed.append(slot)
+        elif action < 0.6 and removed:
+            slot = removed.pop(rng.randrange(len(removed)))
+            queued[slot] = True
+            assert review_queue.restore(slot) == expected().index(names[slot])
+        elif action < 0.75:
+            name = f"new{step}"
+            assert review_queue.append(name) == len(names)
+            names.append(name)
+            queued.append(True)
+        elif action < 0.85 and len(review_queue):
+            name = rng.choice(expected())
+            slot = review_queue.slots[name]
+            review_queue.move_to_end(name)
+            queued[slot] = False
+            names.append(name)
+            queued.append(True)
+        elif len(review_queue):
+            name = rng.choice(expected())
+            assert review_queue.discard(name) == expected().index(name)
+            queued[review_queue.slots[name]] = False
+            assert review_queue.discard(name) is None
+
+        current = expected()
+        assert len(review_queue) == len(current)
+        if step % 50 == 0:
+            assert list(review_queue) == current
+            for position, name in enumerate(current):
+                assert review_queue[position] == name
+                assert review_queue.position_of(review_queue.slot_at(position)) == position
+
+    rebuilt = ReviewQueue.from_state(review_queue.names, [slot for slot, flag in enumerate(queued) if not flag])
+    assert list(rebuilt) == expected()
+    assert [rebuilt.slot_at(i) for i in range(len(rebuilt))] == [review_queue.slot_at(i) for i in range(len(rebuilt))]
+    with pytest.raises(IndexError):
+        review_queue.slot_at(len(review_queue))
+
+
+def test_session_log_replays_to_the_same_state(tmp_path):
+    folder = str(tmp_path)
+    approved = os.path.join(folder, 'approved')
+    session = SessionLog(folder)
+    review_queue = ReviewQueue()
+    undo_log = UndoLog()
+    session.compact(review_queue, undo_log, [])
+    session.open()
+    review_queue.journal = undo_log.journal = session.write
+
+    review_queue.extend(f"img{i}.jpg" for i in range(6))
+    for position in (2, 0, 3):
+        name = review_queue[position]
+        slot = review_queue.remove_at(position)
+        undo_log.record(UndoRecord(name, folder, approved, 'approved', slot))
+    record = undo_log.pop_undo()
+    review_queue.restore(record.position)
+    undo_log.push_redo(record)
+    review_queue.append('late.jpg')
+    session.write({'op': 'auto_reject', 'name': 'img5.jpg'})
+    review_queue.discard('img5.jpg')
+    session.write({'op': 'view', 'view': {'index': 1, 'zoom': 0.6}})
+
+    def state(review_queue, undo_log):
+        return (list(review_queue), review_queue.names,
+                [(r.file, r.source, r.destination, r.action, r.position) for r in undo_log.done],
+                [(r.file, r.position) for r in undo_log.undone])
+
+    restored_queue, restored_log, auto_rejected, view = SessionLog(folder).load()
+    assert state(restored_queue, restored_log) == state(review_queue, undo_log)
+    assert auto_rejected == ['img5.jpg']
+    assert view == {'index': 1, 'zoom': 0.6}
+
+    # A line torn by a crash is dropped, everything before it survives
+    session.file.write('{"op":"remove","sl')
+    session.close()
+    assert state(*SessionLog(folder).load()[:2]) == state(review_queue, undo_log)
+
+    # Compacting keeps the state in a single snapshot line
+    session.compact(review_queue, undo_log, auto_rejected, view)
+    with open(session.path, encoding='utf-8') as f:
+        assert len(f.readlines()) == 1
+    loaded = SessionLog(folder).load()
+    assert state(*loaded[:2]) == state(review_queue, undo_log) and loaded[3] == view
+
+
+def make_images(folder, count):
+    for i in range(count):
+        Image.new('RGB', (8, 8), (i, 0, 0)).save(os.path.join(folder, f"img{i}.jpg"))
+
+
+def test_dropped_deferred_decisions_requeue_their_images(tmp_path):
+    folder = str(tmp_path)
+    make_images(folder, 5)
+    engine = ApprovalEngine()
+    engine.open_folder(folder)
+    engine.start_session()
+    engine.scan()
+    names = list(engine.image_files)
+    engine.defer_moves = True
+    engine.decide(4, engine.approved_folder, 'approved')
+    engine.decide(2, engine.disapproved_folder, 'disapproved')
+    engine.drop_pending()
+    assert list(engine.image_files) == names
+    assert len(engine.undo_log) == 0
+    engine.close()
+
+    resumed = ApprovalEngine()
+    resumed.open_folder(folder)
+    assert resumed.start_session()
+    resumed.scan()
+    assert list(resumed.image_files) == names
+    resumed.close()
+
+
+@pytest.mark.skipif(os.name == 'nt', reason="select() needs a pipe")
+def test_watcher_reports_every_file_after_an_event_overflow(tmp_path):
+    make_images(str(tmp_path), 3)
+    watcher = FolderWatcher(str(tmp_path), poll_interval=0.05)
+    if watcher.fd is not None:
+        os.close(watcher.fd)
+    # Stand in for the inotify descriptor with a queue overflow notice
+    watcher.fd, write_end = os.pipe()
+    os.write(write_end, FolderWatcher.EVENT_HEADER.pack(-1, FolderWatcher.IN_Q_OVERFLOW, 0, 0))
+    watcher.start()
+    try:
+        deadline = time.monotonic() + 5
+        events = []
+        while len(events) < 3 and time.monotonic() < deadline:
+            events += watcher.drain()
+            time.sleep(0.01)
+        assert sorted(events) == [('added', f"img{i}.jpg") for i in range(3)]
+        # Still watching, by polling now
+        os.unlink(tmp_path / 'img1.jpg')
+        while ('removed', 'img1.jpg') not in events and time.monotonic() < deadline:
+            events += watcher.drain()
+            time.sleep(0.01)
+        assert ('removed', 'img1.jpg') in events
+    finally:
+        watcher.stop()
+        watcher.thread.join()
+        os.close(write_end)
+
+
+def test_dropped_deferred_decisions_are_undone_in_the_report(tmp_path):
+    folder = str(tmp_path)
+    make_images(folder, 3)
+    engine = ApprovalEngine()
+    engine.open_folder(folder)
+    engine.open_report('alice')
+    engine.scan()
+    engine.defer_moves = True
+    name = engine.image_files[0]
+    engine.decide(0, engine.approved_folder, 'approved')
+    engine.drop_pending()
+    expected = [(name, None, 'alice', 'not committed')]
+    rows = lambda report: [(row['file'], row['decision'], row['reviewer'], row['comment']) for row in report.snapshot()]
+    assert rows(engine.report) == expected
+    engine.close()
+    assert rows(image_approver.DecisionReport(folder).load()) == expected
+
+
+def test_redo_brings_back_the_rest_of_a_burst(tmp_path):
+    folder = str(tmp_path)
+    make_images(folder, 5)
+    engine = ApprovalEngine()
+    engine.open_folder(folder)
+    engine.scan()
+    engine.defer_moves = True
+    names = list(engine.image_files)
+    engine.decide_group([0, 1, 2], engine.approved_folder, 'approved')
+    engine.undo()
+    assert list(engine.image_files) == names
+    # The first image of the burst was deleted by someone else meanwhile
+    engine.image_files.discard(names[0])
+
+    assert engine.redo() == 0
+    assert list(engine.image_files) == names[3:]
+    assert [record.file for record in engine.undo_log] == names[1:3]
+    assert not engine.undo_log.can_redo()
+    assert engine.redo() is None
+    engine.close()
+
+
+def write_journal(path, records, torn=False):
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+        if torn:
+            f.write('{"op":"do')
+
+
+def test_replay_journal_finishes_incomplete_moves(tmp_path):
+    source = tmp_path / 'src'
+    destination = tmp_path / 'dst'
+    source.mkdir()
+    destination.mkdir()
+    for name in ('done.jpg', 'pending.jpg', 'copied.jpg', 'cancelled.jpg'):
+        (source / name).write_bytes(name.encode())
+    # Copied across devices before the crash, source not removed yet
+    (destination / 'copied.jpg').write_bytes(b'copied.jpg')
+    (destination / ('pending.jpg' + image_approver.PARTIAL_SUFFIX)).write_bytes(b'pend')
+    move = lambda job, name: {'op': 'move', 'id': job, 'src': str(source / name), 'dst': str(destination / name)}
+    journal = tmp_path / 'moves.journal'
+    write_journal(journal, [move(1, 'done.jpg'), {'op': 'done', 'id': 1}, move(2, 'pending.jpg'),
+                            move(3, 'copied.jpg'), move(4, 'gone.jpg'), move(5, 'cancelled.jpg'),
+                            {'op': 'cancel', 'id': 5}], torn=True)
+
+    recovered = FileMover.replay_journal(str(journal))
+
+    assert recovered == [(str(source / 'pending.jpg'), str(destination / 'pending.jpg')),
+                         (str(source / 'copied.jpg'), str(destination / 'copied.jpg'))]
+    assert sorted(os.listdir(source)) == ['cancelled.jpg', 'done.jpg']
+    assert sorted(os.listdir(destination)) == ['copied.jpg', 'pending.jpg']
+    assert (destination / 'pending.jpg').read_bytes() == b'pending.jpg'
+    assert FileMover.replay_journal(str(tmp_path / 'missing.journal')) == []
+
+
+def test_file_mover_replays_only_abandoned_journals(tmp_path):
+    journal_dir = str(tmp_path / 'journals')
+    (tmp_path / 'a.jpg').write_bytes(b'a')
+    (tmp_path / 'b.jpg').write_bytes(b'b')
+    running = FileMover(journal_dir)
+    try:
+        # In flight in a mover that is still running - must be left alone
+        running._write({'op': 'move', 'id': 99, 'src': str(tmp_path / 'a.jpg'), 'dst': str(tmp_path / 'a2.jpg')})
+        abandoned = os.path.join(journal_dir, 'moves-crashed.journal')
+        write_journal(abandoned, [{'op': 'move', 'id': 1, 'src': str(tmp_path / 'b.jpg'),
+                                   'dst': str(tmp_path / 'b2.jpg')}])
+
+        mover = FileMover(journal_dir)
+        mover.close()
+    finally:
+        running.close()
+
+    assert mover.recovered == [(str(tmp_path / 'b.jpg'), str(tmp_path / 'b2.jpg'))]
+    assert (tmp_path / 'a.jpg').exists() and not (tmp_path / 'a2.jpg').exists()
+    assert not os.path.exists(abandoned)
+
+
+@pytest.mark.parametrize('mode', ['L', 'RGB', 'RGBA'])
+def test_banded_decode_matches_reduce(tmp_path, mode):
+    path = str(tmp_path / 'scan.tif')
+    width, height, factor = 203, 157, 4
+    source = Image.frombytes(mode, (width, height), os.urandom(width * height * len(mode)))
+    # Several strips, and bands smaller than a strip
+    source.save(path, tiffinfo={278: 10})
+
+    with Image.open(path) as image:
+        banded = banded_decode(image, factor, band_bytes=width * len(mode) * 12)
+    with Image.open(path) as image:
+        expected = image.reduce(factor)
+
+    assert banded is not None
+    assert banded.mode == expected.mode and banded.size == expected.size
+    assert banded.tobytes() == expected.tobytes()
+
+
+def test_banded_decode_declines_compressed_files(tmp_path):
+    path = str(tmp_path / 'scan.tif')
+    Image.new('RGB', (64, 64)).save(path, compression='tiff_deflate')
+    with Image.open(path) as image:
+        assert banded_decode(image, 2) is None
+
+
+def test_large_images_are_opened_past_the_bomb_limit_and_decoded_reduced(tmp_path, monkeypatch):
+    path = str(tmp_path / 'scan.png')
+    source = Image.frombytes('RGB', (200, 150), os.urandom(200 * 150 * 3))
+    source.save(path)
+    monkeypatch.setattr(Image, 'MAX_IMAGE_PIXELS', 1000)
+    monkeypatch.setattr(image_approver, 'LARGE_IMAGE_PIXELS', 100)
+    with pytest.raises(Image.DecompressionBombError):
+        Image.open(path)
+
+    image = image_approver.open_image(path)
+    assert Image.MAX_IMAGE_PIXELS == 1000
+    reduced = image_approver.decode_reduced(image, (60, 40))
+    # The largest whole factor that still covers 60x40
+    assert reduced.size == (67, 50)
+    assert reduced.tobytes() == source.reduce(3).tobytes()
+
+
+def try_decode_lock():
+    if not image_approver.LARGE_DECODE_LOCK.acquire(False):
+        return False
+    image_approver.LARGE_DECODE_LOCK.release()
+    return True
+
+
+def test_pool_workers_share_the_large_decode_lock():
+    with image_approver.process_pool(1) as pool:
+        with image_approver.LARGE_DECODE_LOCK:
+            assert pool.submit(try_decode_lock).result() is False
+        assert pool.submit(try_decode_lock).result() is True
+
+
+def test_command_line_scans_and_applies_decision_files(tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    monkeypatch.setenv('LOCALAPPDATA', str(tmp_path / 'cache'))
+    folder = tmp_path / 'photos'
+    folder.mkdir()
+    make_images(str(folder), 3)
+    (folder / 'notes.txt').write_text("not an image")
+
+    assert image_approver.main(['scan', str(folder)]) == 0
+    assert sorted(capsys.readouterr().out.split()) == ['img0.jpg', 'img1.jpg', 'img2.jpg']
+
+    decisions = tmp_path / 'decisions.csv'
+    decisions.write_text("file,decision\nimg0.jpg,approve\nimg2.jpg,reject\nmissing.jpg,approve\n")
+    assert image_approver.main(['apply', str(folder), str(decisions), '--reviewer', 'bob']) == 0
+    assert os.listdir(folder / 'approved') == ['img0.jpg']
+    assert os.listdir(folder / 'disapproved') == ['img2.jpg']
+    assert "1 file(s) in the decision file were not found" in capsys.readouterr().err
+
+    assert image_approver.main(['apply', str(tmp_path / 'nowhere'), str(decisions)]) == 2
+
+
+def test_read_decision_file_formats(tmp_path):
+    expected = [('a.jpg', 'approved'), ('b.jpg', 'disapproved'), ('c.jpg', 'retouch')]
+
+    (tmp_path / 'd.csv').write_text("filename,decision\nsub/a.jpg,Approve\nb.jpg,reject\nc.jpg,retouch\n")
+    (tmp_path / 'd.json').write_text(json.dumps({'a.jpg': 'yes', 'b.jpg': 'no', 'c.jpg': 'retouch'}))
+    (tmp_path / 'list.json').write_text(json.dumps([{'file': 'a.jpg', 'action': 'accept'},
+                                                    {'name': 'b.jpg', 'decision': 'disapproved'},
+                                                    {'file': 'c.jpg', 'decision': 'retouch'}]))
+    (tmp_path / 'd.jsonl').write_text('{"file": "a.jpg", "decision": "approved"}\n\n'
+                                      '{"file": "b.jpg", "decision": "rejected"}\n'
+                                      '{"file": "c.jpg", "decision": "retouch"}\n')
+    for name in ('d.csv', 'd.json', 'list.json', 'd.jsonl'):
+        assert read_decision_file(str(tmp_path / name), categories=('retouch',)) == expected
+
+    with pytest.raises(ValueError):
+        read_decision_file(str(tmp_path / 'd.csv'))
+    (tmp_path / 'bad.csv').write_text("file,verdict\na.jpg,approve\n")
+    with pytest.raises(ValueError):
+        read_decision_file(str(tmp_path / 'bad.csv'))
+
+
+def test_undo_puts_images_back_where_they_were_queued(tmp_path):
+    folder = str(tmp_path)
+    make_images(folder, 6)
+    engine = ApprovalEngine()
+    engine.open_folder(folder)
+    engine.scan()
+    engine.defer_moves = True
+    names = list(engine.image_files)
+    engine.decide(2, engine.approved_folder, 'approved')
+    engine.decide(0, engine.disapproved_folder, 'disapproved')
+    engine.decide(-1, engine.approved_folder, 'approved')
+    engine.image_files.append('late.jpg')
+    engine.image_files.discard(names[3])
+
+    while engine.undo():
+        pass
+    assert list(engine.image_files) == names[:3] + names[4:] + ['late.jpg']
+    assert engine.redo() == 2 and engine.redo() == 0
+    assert list(engine.image_files) == [names[1], names[4], names[5], 'late.jpg']
+    engine.close()
+
+
+def test_moves_run_in_the_background_and_undo_moves_back(tmp_path):
+    folder = tmp_path / 'photos'
+    folder.mkdir()
+    make_images(str(folder), 3)
+    mover = FileMover(str(tmp_path / 'journals'))
+    engine = ApprovalEngine(mover=mover)
+    engine.open_folder(str(folder))
+    engine.scan()
+    names = list(engine.image_files)
+    engine.decide(1, engine.approved_folder, 'approved')
+    engine.decide(0, engine.disapproved_folder, 'disapproved')
+    mover.wait_all()
+    assert sorted(os.listdir(engine.approved_folder)) == [names[1]]
+    assert sorted(os.listdir(engine.disapproved_folder)) == [names[0]]
+    # Nothing in flight, so the journal has been emptied
+    assert os.path.getsize(mover.journal_path) == 0
+
+    engine.undo()
+    engine.undo()
+    assert list(engine.image_files) == names
+    assert os.listdir(engine.approved_folder) == os.listdir(engine.disapproved_folder) == []
+    engine.close()
+    assert not os.path.exists(mover.journal_path)
+
+
+def test_find_bursts_matches_brute_force():
+    np = pytest.importorskip('numpy')
+    rng = np.random.default_rng(3)
+    radius = 10
+    hashes = {}
+    for cluster in range(60):
+        center = rng.integers(0, 2 ** 63, size=3, dtype=np.uint64)
+        for member in range(rng.integers(1, 5)):
+            # Flip a few bits of each hash, sometimes past the radius
+            flips = rng.integers(0, 64, size=(3, rng.integers(0, 14)))
+            noise = np.bitwise_or.reduce(np.uint64(1) << flips.astype(np.uint64), axis=1)
+            hashes[f"c{cluster}_{member}"] = [int(value) for value in center ^ noise]
+
+    names = list(hashes)
+    parent = {name: name for name in names}
+
+    def root(name):
+        while parent[name] != name:
+            name = parent[name]
+        return name
+
+    for i, a in enumerate(names):
+        for b in names[i + 1:]:
+            if all(bin(x ^ y).count('1') <= radius for x, y in zip(hashes[a], hashes[b])):
+                parent[root(a)] = root(b)
+    expected = {}
+    for name in names:
+        expected.setdefault(root(name), set()).add(name)
+    expected = sorted(sorted(group) for group in expected.values() if len(group) > 1)
+
+    bursts = image_approver.find_bursts(hashes, radius)
+    groups = {id(group): group for group in bursts.values()}
+    assert expected and sorted(sorted(group) for group in groups.values()) == expected
+    assert all(name in bursts[name] for name in bursts)
+
+
+def test_quality_screen_flags_blurry_and_badly_exposed_images(tmp_path):
+    pytest.importorskip('numpy')
+    from PIL import ImageFilter
+    noise = Image.effect_noise((256, 256), 64).convert('RGB')
+    images = {
+        'sharp.png': noise,
+        'blurry.png': noise.filter(ImageFilter.GaussianBlur(6)),
+        'dark.png': Image.eval(noise, lambda value: value // 16),
+        'bright.png': Image.eval(noise, lambda value: 255 - value // 16),
+        'clipped.png': Image.eval(noise, lambda value: 0 if value < 100 else value),
+    }
+    for name, image in images.items():
+        image.save(tmp_path / name)
+
+    screen = image_approver.QualityScreen()
+    quality = {name: entry[7] for name, entry in image_approver.probe_images(str(tmp_path), list(images))}
+    assert {name: screen.verdict(metrics) for name, metrics in quality.items()} == {
+        'sharp.png': None, 'blurry.png': 'blurry', 'dark.png': 'underexposed',
+        'bright.png': 'overexposed', 'clipped.png': 'underexposed',
+    }
+    sharpness, dark, bright, luminance = quality['clipped.png']
+    assert dark > 0.3 and bright < 0.1 and sharpness > quality['sharp.png'][0]
+    assert screen.verdict(None) is None
+
+
+def test_routing_table_resolves_and_validates_categories(tmp_path):
+    folder = str(tmp_path)
+    routes = image_approver.RoutingTable(folder, {
+        'retouch': {'key': 'r'},
+        'client-pick': {'key': 'c', 'folder': 'picks/client'},
+        'archive': {'key': 'F1', 'folder': str(tmp_path / 'archive')},
+        'approved': {'key': 'a'},
+    })
+    assert dict(routes.keys) == {'disapproved': 'Left', 'approved': 'a', 'retouch': 'r',
+                                 'client-pick': 'c', 'archive': 'F1'}
+    real = os.path.realpath(folder)
+    assert routes.folders['retouch'] == os.path.join(real, 'retouch')
+    assert routes.folders['client-pick'] == os.path.join(real, 'picks', 'client')
+    assert routes.folders['archive'] == os.path.join(real, 'archive')
+    routes.create_folders()
+    assert all(os.path.isdir(path) for path in routes.folders.values())
+    assert all(routes.same_device.values())
+
+    for table in ({'retouch': 'r'},  # not an object
+                  {'.hidden': {'key': 'h'}},
+                  {'retouch': {}},
+                  {'retouch': {'key': 'z'}},  # undo
+                  {'retouch': {'key': 'r'}, 'rework': {'key': 'r'}},
+                  {'retouch': {'key': 'r'}, 'Retouch': {'key': 'R'}},  # R sorts a burst of r
+                  {'Retouch': {'key': 'R'}, 'retouch': {'key': 'r'}}):
+        with pytest.raises(ValueError):
+            image_approver.RoutingTable(folder, table)
+
+    (tmp_path / image_approver.RoutingTable.FILE_NAME).write_text('["retouch"]')
+    with pytest.raises(ValueError):
+        image_approver.RoutingTable.load(folder)
+
+
+def test_decision_report_replays_and_exports_the_latest_rows(tmp_path):
+    folder = str(tmp_path)
+    report = image_approver.DecisionReport(folder, reviewer='alice').open()
+    report.record('a.jpg', 'approved')
+    report.comment('b.jpg', "needs a crop")
+    report.record('c.jpg', 'disapproved')
+    report.record('c.jpg', 'undone')
+    report.record('d.jpg', 'retouch')
+    report.comment('d.jpg', 'skin, "eyes"')
+    report.close()
+    with open(report.path, 'a', encoding='utf-8') as f:
+        f.write('{"file":"a.jpg","decis')
+
+    reloaded = image_approver.DecisionReport(folder, reviewer='bob').load()
+    rows = [(row['file'], row['decision'], row['reviewer'], row['comment']) for row in reloaded.snapshot()]
+    assert rows == [('a.jpg', 'approved', 'alice', None), ('b.jpg', None, 'alice', "needs a crop"),
+                    ('d.jpg', 'retouch', 'alice', 'skin, "eyes"')]
+    assert reloaded.comment_of('d.jpg') == 'skin, "eyes"' and reloaded.comment_of('c.jpg') is None
+
+    assert reloaded.export(str(tmp_path / 'qa.csv')) == 3
+    with open(tmp_path / 'qa.csv', newline='', encoding='utf-8') as f:
+        exported = list(csv.DictReader(f))
+    assert [(row['file'], row['decision'], row['comment']) for row in exported] == \
+        [('a.jpg', 'approved', ''), ('b.jpg', '', "needs a crop"), ('d.jpg', 'retouch', 'skin, "eyes"')]
+    assert reloaded.export(str(tmp_path / 'qa.jsonl')) == 3
+    with open(tmp_path / 'qa.jsonl', encoding='utf-8') as f:
+        assert [json.loads(line) for line in f] == reloaded.snapshot()
+    assert not os.path.exists(str(tmp_path / 'qa.csv') + image_approver.PARTIAL_SUFFIX)
+
+
+def test_preview_cache_evicts_the_least_recently_used(tmp_path):
+    db_path = str(tmp_path / 'previews.sqlite')
+    source = tmp_path / 'a.jpg'
+    source.write_bytes(b'original')
+    stat = os.stat(source)
+    data = image_approver.encode_preview(Image.new('RGB', (32, 32), (200, 10, 10)))
+    cache = image_approver.PreviewCache(db_path, max_bytes=3 * len(data))
+    try:
+        for sizing in ('a', 'b', 'c'):
+            cache.store(cache.make_key(str(source), stat, sizing), data, 640, 480)
+        preview, original_size = cache.get(str(source), stat, 'a')
+        assert preview.size == (32, 32) and original_size == (640, 480)
+        cache.store(cache.make_key(str(source), stat, 'd'), data, 640, 480)
+        assert [cache.contains(cache.make_key(str(source), stat, sizing)) for sizing in 'abcd'] == \
+            [True, False, True, True]
+        assert cache.total_bytes == 3 * len(data)
+        # An edited file never gets the old preview
+        os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        assert cache.get(str(source), os.stat(source), 'a') is None
+    finally:
+        cache.close()
+
+    reopened = image_approver.PreviewCache(db_path, max_bytes=len(data))
+    try:
+        assert reopened.total_bytes == 3 * len(data)
+        reopened.store(reopened.make_key(str(source), stat, 'e'), data, 640, 480)
+        assert reopened.total_bytes == len(data) and reopened.get(str(source), stat, 'e') is not None
+    finally:
+        reopened.close()
+
+
+def test_prefetcher_cancels_jobs_that_are_no_longer_wanted():
+    release = threading.Event()
+    loaded = []
+
+    def loader(image_path, zoom_factor):
+        release.wait(5)
+        loaded.append(image_path)
+        return Image.new('RGB', (10, 10))
+
+    prefetcher = image_approver.ImagePrefetcher(loader, workers=1, budget_bytes=2 * 300)
+    try:
+        prefetcher.schedule(['a', 'b', 'c'], 0.4)
+        # a is already running, b and c are still queued
+        deadline = time.monotonic() + 5
+        while not prefetcher.pending[('a', 0.4)].running() and time.monotonic() < deadline:
+            time.sleep(0.001)
+        prefetcher.schedule(['d', 'e', 'f'], 0.4)
+        assert set(prefetcher.pending) == {('a', 0.4), ('d', 0.4), ('e', 0.4), ('f', 0.4)}
+        assert prefetcher.get('b', 0.4) is None
+        release.set()
+
+        assert prefetcher.get('f', 0.4).size == (10, 10)
+        assert loaded == ['a', 'd', 'e', 'f']
+        # a finished after it stopped being wanted, and only two images fit the budget
+        assert list(prefetcher.cache) == [('e', 0.4), ('f', 0.4)]
+        assert prefetcher.cache_bytes == 2 * 300
+    finally:
+        release.set()
+        prefetcher.shutdown()
+
+
+def test_cross_device_categories_are_copied_without_trying_a_rename(tmp_path, monkeypatch):
+    folder = tmp_path / 'photos'
+    folder.mkdir()
+    make_images(str(folder), 2)
+    engine = ApprovalEngine(mover=FileMover(str(tmp_path / 'journals')))
+    engine.open_folder(str(folder))
+    engine.scan()
+    # As if approved/ were a mount of its own
+    engine.routes.same_device['approved'] = False
+    renamed = []
+    rename = os.rename
+    monkeypatch.setattr(os, 'rename', lambda a, b: renamed.append(b) or rename(a, b))
+
+    names = list(engine.image_files)
+    engine.decide(0, engine.approved_folder, 'approved')
+    engine.decide(0, engine.disapproved_folder, 'disapproved')
+    engine.mover.wait_all()
+    assert renamed == [os.path.join(engine.disapproved_folder, names[1])]
+    assert os.listdir(engine.approved_folder) == [names[0]]
+    engine.undo()
+    engine.undo()
+    # Only the disapproved move and its undo were renames
+    assert renamed[1:] == [os.path.join(str(folder), names[1])]
+    assert sorted(os.listdir(folder)) == sorted(names + ['approved', 'disapproved'])
+    engine.close()